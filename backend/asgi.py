@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Static files are served in front of Django's (fully async) middleware chain, see core/static_files.py.
+from core.static_files import StaticFilesASGI  # noqa: E402
+
+application = StaticFilesASGI(django_application)
@@ -13,4 +13,9 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_wsgi_application()
+django_application = get_wsgi_application()
+
+# Static files are served in front of Django's middleware chain, see core/static_files.py.
+from core.static_files import StaticFilesWSGI  # noqa: E402
+
+application = StaticFilesWSGI(django_application)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from .models import Banner, TrendingItem
 
@@ -14,20 +15,42 @@ class TrendingItemAdmin(admin.ModelAdmin):
     search_fields = ("name", "sub_name")
 
 
-from .models import Product, ProductImage, Color, Size
+from .models import Product, ProductImage, ProductVariant, Color, Size
+from .search import search_filter
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 6
 
+class ProductVariantInline(admin.TabularInline):
+    """Stock per color/size; the rows follow the product's colors and sizes."""
+    model = ProductVariant
+    extra = 0
+    fields = ("color", "size", "stock")
+    readonly_fields = ("color", "size")
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("name", "category", "price", "rating", "created_at")
+    list_display = ("name", "category", "price", "rating", "image_count", "created_at")
     list_filter = ("category",)
     search_fields = ("name", "sub_name")
-    inlines = [ProductImageInline]
+    inlines = [ProductImageInline, ProductVariantInline]
     filter_horizontal = ("colors", "sizes")
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Saving the stock of a variant whose color or size was just removed re-inserts it.
+        ProductVariant.objects.sync([form.instance.pk], stock=settings.VARIANT_DEFAULT_STOCK)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains scans.
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(search_filter(search_term)), False
+
 @admin.register(Color)
 class ColorAdmin(admin.ModelAdmin):
     list_display = ("name", "hex")
@@ -41,7 +64,12 @@ class SizeAdmin(admin.ModelAdmin):
 
 # admin.py
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import StreamingHttpResponse
+from django.urls import path
 from .models import Order, OrderItem
+from .renderers import stream_json_array
+from .serializers import OrderExportSerializer
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -55,8 +83,44 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ("order_number", "user__username")
     inlines = [OrderItemInline]
     readonly_fields = ("order_number", "created_at", "updated_at", "total_price", "shipping_address")
+    actions = ["export_json"]
+
+    def get_urls(self):
+        export = path("export.json", self.admin_site.admin_view(self.export_all_json), name="core_order_export")
+        return [export] + super().get_urls()
+
+    def export_all_json(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        return self.export_json(request, self.get_queryset(request))
+
+    @admin.action(description="Export selected orders as JSON")
+    def export_json(self, request, queryset):
+        """
+        Streams the orders as a JSON array, fetching ORDER_EXPORT_CHUNK_SIZE
+        orders (and their items) per query, so memory stays flat however many
+        orders there are.
+        """
+        orders = queryset.prefetch_related("items").order_by("pk")
+        serializer = OrderExportSerializer()
+        response = StreamingHttpResponse(
+            stream_json_array(orders.iterator(chunk_size=settings.ORDER_EXPORT_CHUNK_SIZE),
+                              serializer.to_representation),
+            content_type="application/json",
+        )
+        response["Content-Disposition"] = 'attachment; filename="orders.json"'
+        return response
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ("product_name", "order", "quantity", "unit_price")
     search_fields = ("product_name", "order__order_number")
+
+
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("kind", "status", "attempts", "run_after", "created_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("created_at", "updated_at", "locked_at", "last_error")
@@ -0,0 +1,169 @@
+"""
+Async (ASGI-native) variants of the hot read endpoints.
+
+DRF views are synchronous, so under an ASGI server every request to them
+takes a slot in the sync thread pool.  The views here are plain Django
+coroutines served under ``/api/async/...``: they authenticate with the same
+JWT settings, query through the async ORM (``aget``, ``aaggregate``, async
+iteration, ``aprefetch_related_objects``), reuse the serializers and
+paginators of the sync views on the loaded objects and render with the
+API's ``FastJSONRenderer``, so their bodies match the sync endpoints.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, Sum, aprefetch_related_objects
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, ValidationError
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+
+from .cache import aget_version, catalog_cache, response_cache_key, version_etag
+from .routers import read_for_version
+from .fast_serializers import PRODUCT_LIST_FIELDS, serialize_product_list
+from .filters import ProductFilter
+from .models import Cart, CartItem, Order, Product
+from .pagination import OrderCursorPagination, ProductCursorPagination
+from .renderers import FastJSONRenderer
+from .serializers import CartSerializer, OrderListSerializer, ProductDetailSerializer
+from .views import acart_count_cache_key, cart_count_timeout, cart_etag
+
+_renderer = FastJSONRenderer()
+
+
+def render(data, status_code=200):
+    return HttpResponse(_renderer.render(data), status=status_code, content_type="application/json")
+
+
+def render_error(exc):
+    # Same body and headers as DRF's exception handler.
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    response = render(data, exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response["WWW-Authenticate"] = JWTAuthentication().authenticate_header(None)
+    return response
+
+
+async def authenticate(request, stateless=False):
+    """
+    The user of the request's Bearer token, or raise an ``APIException``.
+    ``stateless`` returns a ``TokenUser`` without touching the database.
+    """
+    authenticator = JWTStatelessUserAuthentication() if stateless else JWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise NotAuthenticated()
+    token = authenticator.get_validated_token(raw_token)
+    if stateless:
+        return authenticator.get_user(token)
+    return await sync_to_async(authenticator.get_user)(token)
+
+
+# --- Cart ---
+@require_GET
+async def cart_count(request):
+    try:
+        user = await authenticate(request, stateless=True)
+    except APIException as exc:
+        return render_error(exc)
+    key = await acart_count_cache_key(user.pk)
+    total_qty = await cache.aget(key)
+    if total_qty is None:
+        total_qty = (await CartItem.objects.filter(cart__user_id=user.pk).aaggregate(
+            total=Coalesce(Sum("quantity"), 0)
+        ))["total"]
+        await cache.aset(key, total_qty, cart_count_timeout())
+    return render({"count": total_qty})
+
+
+@require_GET
+async def cart_detail(request):
+    try:
+        user = await authenticate(request)
+    except APIException as exc:
+        return render_error(exc)
+    cart, created = await Cart.objects.with_total_price().aget_or_create(user=user)
+    if created:
+        cart = await Cart.objects.with_total_price().aget(pk=cart.pk)
+    etag = cart_etag(cart, await aget_version("products"))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        await aprefetch_related_objects([cart], Prefetch("items", queryset=CartItem.objects.for_display()))
+        response = render(CartSerializer(cart, context={"request": request}).data)
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# --- Products ---
+async def cached_response(group, view, request, *args, **kwargs):
+    """Async ``CachedCatalogMixin.cached_response``; ``view`` returns (data, status)."""
+    version = await aget_version(group)
+    last_modified = version // 1_000_000_000
+    key = response_cache_key(group, version, request)
+    etag = version_etag(key)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        cache = catalog_cache()
+        data = await cache.aget(key)
+        if data is None:
+            with read_for_version(version):
+                data, status_code = await view(request, *args, **kwargs)
+            if status_code != 200:
+                return render(data, status_code)
+            await cache.aset(key, data, getattr(settings, "CATALOG_CACHE_TIMEOUT", 300))
+        response = render(data)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=getattr(settings, "CATALOG_CACHE_MAX_AGE", 0))
+    return response
+
+
+async def _product_list(request):
+    filterset = ProductFilter(request.query_params, queryset=Product.objects.all(), request=request)
+    if not filterset.is_valid():
+        return ValidationError(filterset.errors).detail, 400
+    paginator = ProductCursorPagination()
+    page = await paginator.apaginate_queryset(filterset.qs.values(*PRODUCT_LIST_FIELDS), request)
+    return paginator.get_paginated_response(serialize_product_list(page, request)).data, 200
+
+
+async def _product_detail(request, pk):
+    try:
+        product = await Product.objects.for_detail().aget(pk=pk)
+    except Product.DoesNotExist:
+        return {"detail": "No Product matches the given query."}, 404
+    return ProductDetailSerializer(product, context={"request": request}).data, 200
+
+
+@require_GET
+async def product_list(request):
+    return await cached_response("products", _product_list, Request(request))
+
+
+@require_GET
+async def product_detail(request, pk):
+    return await cached_response("products", _product_detail, Request(request), pk)
+
+
+# --- Orders ---
+@require_GET
+async def user_orders(request):
+    try:
+        user = await authenticate(request)
+    except APIException as exc:
+        return render_error(exc)
+    request = Request(request)
+    paginator = OrderCursorPagination()
+    page = await paginator.apaginate_queryset(
+        Order.objects.filter(user=user).prefetch_related("items"), request,
+    )
+    serializer = OrderListSerializer(page, many=True, context={"request": request})
+    return render(paginator.get_paginated_response(serializer.data).data)
@@ -0,0 +1,123 @@
+"""
+Response cache for the public catalog endpoints.
+
+Each cached group ("products", "banners", "trending") has a version stamp
+stored in the cache itself.  Response keys embed the current version, so a
+write only has to bump the version (see ``core.signals``) for every cached
+page of that group to be ignored; stale entries then age out on their own.
+This works the same on locmem and Redis since nothing is deleted by pattern,
+but only a shared cache carries a bump to the other worker processes; on a
+process-local one the versions expire after CATALOG_VERSION_TIMEOUT instead.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .routers import read_for_version
+
+VERSION_KEY = "catalog:version:{group}"
+
+
+def catalog_cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+def is_shared(cache):
+    """Whether writes to ``cache`` are seen by every process (locmem's are not)."""
+    return not isinstance(cache, LocMemCache)
+
+
+def version_timeout():
+    return getattr(settings, "CATALOG_VERSION_TIMEOUT", None)
+
+
+def get_version(group):
+    """Version stamp of ``group``: nanoseconds since the epoch of its last change."""
+    cache = catalog_cache()
+    key = VERSION_KEY.format(group=group)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, version_timeout()):
+            version = cache.get(key, version)
+    return version
+
+
+async def aget_version(group):
+    """``get_version`` for async views."""
+    cache = catalog_cache()
+    key = VERSION_KEY.format(group=group)
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, version_timeout()):
+            version = await cache.aget(key, version)
+    return version
+
+
+def bump_version(group):
+    cache = catalog_cache()
+    key = VERSION_KEY.format(group=group)
+    previous = cache.get(key) or 0
+    # Move on by at least a whole second so Last-Modified (second resolution)
+    # changes too, not just the ETag.
+    next_second = (previous // 1_000_000_000 + 1) * 1_000_000_000
+    cache.set(key, max(time.time_ns(), next_second), version_timeout())
+
+
+def response_cache_key(group, version, request):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    url = f"{request.scheme}://{request.get_host()}{request.path}?{query}"
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f"catalog:response:{group}:{version}:{digest}"
+
+
+def version_etag(key):
+    # The key already embeds the group version, so it changes with every write.
+    return 'W/"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+class CachedCatalogMixin:
+    """
+    Serve ``list``/``retrieve`` from the catalog cache, with ETag and
+    Last-Modified headers.  Both validators come from the group version
+    alone, so a matching conditional GET is answered with 304 before the
+    cached body is fetched or anything is serialized.
+    """
+    cache_group = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, view, request, *args, **kwargs):
+        version = get_version(self.cache_group)
+        last_modified = version // 1_000_000_000
+        key = response_cache_key(self.cache_group, version, request)
+        etag = version_etag(key)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            cache = catalog_cache()
+            data = cache.get(key)
+            if data is None:
+                with read_for_version(version):
+                    response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.data, getattr(settings, "CATALOG_CACHE_TIMEOUT", 300))
+            else:
+                response = Response(data)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, public=True, max_age=getattr(settings, "CATALOG_CACHE_MAX_AGE", 0))
+        return response
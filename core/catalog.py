@@ -0,0 +1,222 @@
+"""
+In-process, read-only snapshot of the product catalog.
+
+The catalog changes a few times a day but is read on every page view, so
+each worker process keeps the whole of it in memory: one ``ProductRecord``
+(``__slots__``) per product in listing order, color and size dicts shared
+between products, and per-category/color/size sets of product ids for
+filtering.  ``ProductViewSet`` serves list, filter and detail requests from
+it without touching the database.
+
+A snapshot is tagged with the "products" cache version (``core.cache``) it
+was built for; the invalidation signals that bump that version make the
+next request in every process build a new snapshot and swap it in.  That
+only holds when the version lives in a shared cache (Redis): on locmem a
+bump, including one made by a management command, stays in its own
+process, so ``core.checks`` refuses CATALOG_SNAPSHOT there.  A snapshot is
+never modified after it is built.
+
+CATALOG_SNAPSHOT is on when REDIS_URL is set; set it to False to serve
+those endpoints from SQL.
+"""
+import logging
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import get_version
+from .models import Color, Product, ProductImage, Size
+from .pagination import ProductCursorPagination
+from .routers import read_for_version
+
+logger = logging.getLogger(__name__)
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+class ProductRecord:
+    __slots__ = (
+        "id", "name", "sub_name", "price", "rating", "description", "category", "main_image", "main_image_widths",
+        "secure_checkout_image", "size_help_image", "created_at", "colors", "sizes", "images",
+    )
+
+    def __init__(self, id, name, sub_name, price, rating, description, category, main_image, main_image_widths,
+                 secure_checkout_image, size_help_image, created_at, colors, sizes, images):
+        self.id = id
+        self.name = name
+        self.sub_name = sub_name
+        self.price = price
+        self.rating = rating
+        self.description = description
+        self.category = category
+        self.main_image = main_image
+        self.main_image_widths = main_image_widths
+        self.secure_checkout_image = secure_checkout_image
+        self.size_help_image = size_help_image
+        self.created_at = created_at
+        self.colors = colors  # tuple of shared {"id", "name", "hex"} dicts
+        self.sizes = sizes  # tuple of shared {"id", "value"} dicts
+        self.images = images  # tuple of (id, image, order, image_widths), in gallery order
+
+
+RECORD_FIELDS = ProductRecord.__slots__[:12]
+
+
+class CatalogSnapshot:
+    __slots__ = ("version", "products", "ordered", "by_category", "by_color", "by_size", "build_seconds")
+
+    def __init__(self, version, ordered, build_seconds=0.0):
+        self.version = version
+        self.ordered = ordered
+        self.products = {record.id: record for record in ordered}
+        self.build_seconds = build_seconds
+        by_category, by_color, by_size = {}, {}, {}
+        for record in ordered:
+            by_category.setdefault(record.category, set()).add(record.id)
+            for color in record.colors:
+                by_color.setdefault(color["id"], set()).add(record.id)
+            for size in record.sizes:
+                by_size.setdefault(size["id"], set()).add(record.id)
+        self.by_category = {key: frozenset(ids) for key, ids in by_category.items()}
+        self.by_color = {key: frozenset(ids) for key, ids in by_color.items()}
+        self.by_size = {key: frozenset(ids) for key, ids in by_size.items()}
+
+    def get(self, pk):
+        return self.products.get(pk)
+
+    def filter(self, category=None, min_price=None, max_price=None, min_rating=None, color=None, size=None):
+        """
+        Records matching the cleaned ``ProductFilter`` values, in listing
+        order; empty values are ignored, as django-filter does.
+        """
+        ids = None
+        if category:
+            ids = self.by_category.get(category, frozenset())
+        for values, index in ((color, self.by_color), (size, self.by_size)):
+            if values:
+                matching = frozenset().union(*(index.get(value, ()) for value in values))
+                ids = matching if ids is None else ids & matching
+
+        records = self.ordered if ids is None else [record for record in self.ordered if record.id in ids]
+        if min_price is not None:
+            records = [record for record in records if record.price >= min_price]
+        if max_price is not None:
+            records = [record for record in records if record.price <= max_price]
+        if min_rating is not None:
+            records = [record for record in records if record.rating >= min_rating]
+        return records
+
+    def memory_bytes(self):
+        """Approximate deep size of the snapshot; shared objects are counted once."""
+        seen = set()
+        total = 0
+        stack = [self.ordered, self.products, self.by_category, self.by_color, self.by_size]
+        while stack:
+            obj = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            total += sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                stack.extend(obj.keys())
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple, set, frozenset)):
+                stack.extend(obj)
+            elif isinstance(obj, ProductRecord):
+                stack.extend(getattr(obj, name) for name in ProductRecord.__slots__)
+        return total
+
+    def stats(self):
+        count = len(self.ordered)
+        memory = self.memory_bytes()
+        per_10k = 10_000 / count if count else 0
+        return {
+            "version": self.version,
+            "products": count,
+            "build_seconds": round(self.build_seconds, 3),
+            "build_seconds_per_10k": round(self.build_seconds * per_10k, 3),
+            "memory_bytes": memory,
+            "memory_bytes_per_10k": round(memory * per_10k),
+        }
+
+
+def build_snapshot(version):
+    # The rows must be at least as new as ``version``.
+    with read_for_version(version):
+        return _build_snapshot(version)
+
+
+def _build_snapshot(version):
+    start = time.perf_counter()
+    colors = {pk: {"id": pk, "name": name, "hex": hex} for pk, name, hex in Color.objects.values_list("id", "name", "hex")}
+    sizes = {pk: {"id": pk, "value": value} for pk, value in Size.objects.values_list("id", "value")}
+
+    # Options in id order (as the list prefetch returns them on SQLite), one shared tuple per
+    # combination: most products offer one of a few.
+    def options(through, field, lookup):
+        by_product, combinations = {}, {}
+        for product_id, option_id in through.objects.order_by("product_id", field).values_list("product_id", field):
+            by_product.setdefault(product_id, []).append(option_id)
+        for product_id, option_ids in by_product.items():
+            key = tuple(option_ids)
+            if key not in combinations:
+                combinations[key] = tuple(lookup[option_id] for option_id in key)
+            by_product[product_id] = combinations[key]
+        return by_product
+
+    product_colors = options(Product.colors.through, "color_id", colors)
+    product_sizes = options(Product.sizes.through, "size_id", sizes)
+    shared = {}  # one object per distinct price, rating, category, sub_name, derivative widths
+
+    def widths(value):
+        value = tuple(value)
+        return shared.setdefault(("w", value), value)
+
+    images = {}
+    for product_id, pk, image, order, image_widths in ProductImage.objects.order_by(
+        "product_id", "order", "id"
+    ).values_list("product_id", "id", "image", "order", "image_widths"):
+        images.setdefault(product_id, []).append((pk, image, order, widths(image_widths)))
+
+    ordered = []
+    rows = Product.objects.order_by(*ProductCursorPagination.ordering).values_list(*RECORD_FIELDS)
+    for row in rows.iterator(chunk_size=2000):
+        (pk, name, sub_name, price, rating, description, category, main_image, main_image_widths,
+         secure_checkout_image, size_help_image, created_at) = row
+        ordered.append(ProductRecord(
+            pk, name, shared.setdefault(("s", sub_name), sub_name), shared.setdefault(("p", price), price),
+            shared.setdefault(("r", rating), rating), description, shared.setdefault(("c", category), category),
+            main_image, widths(main_image_widths), secure_checkout_image, size_help_image, created_at,
+            product_colors.get(pk, ()), product_sizes.get(pk, ()), tuple(images.get(pk, ())),
+        ))
+    return CatalogSnapshot(version, ordered, time.perf_counter() - start)
+
+
+def enabled():
+    return getattr(settings, "CATALOG_SNAPSHOT", False)
+
+
+def get_snapshot():
+    """The snapshot for the current "products" version, building it if needed."""
+    global _snapshot
+    # Read the version before the rows: a change committed meanwhile bumps it again.
+    version = get_version("products")
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        # Another thread may have built it meanwhile.  Versions are compared for equality only:
+        # they start over from the clock when the cache loses them.
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = build_snapshot(version)
+            logger.info("Catalog snapshot %s: %d products built in %.2fs",
+                        version, len(_snapshot.ordered), _snapshot.build_seconds)
+        return _snapshot
+
+
+def clear():
+    global _snapshot
+    _snapshot = None
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from .cache import catalog_cache, is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if is_shared(catalog_cache()):
+        return []
+    return [Warning(
+        "The catalog cache is process-local (locmem).",
+        hint=(
+            "Catalog and cart count invalidations only reach the process that made the write, so other "
+            f"worker processes serve stale data for up to {settings.LOCAL_CACHE_TIMEOUT}s. Set REDIS_URL "
+            "when more than one process serves the site."
+        ),
+        id="core.W001",
+    )]
+
+
+@register(Tags.caches)
+def check_catalog_snapshot(app_configs, **kwargs):
+    if not getattr(settings, "CATALOG_SNAPSHOT", False) or is_shared(catalog_cache()):
+        return []
+    return [Error(
+        "CATALOG_SNAPSHOT needs a shared cache.",
+        hint=(
+            "A process rebuilds its catalog snapshot when the \"products\" version in the cache moves. "
+            "On a process-local cache it never sees the bumps made by other workers or by management "
+            "commands, and would serve the old catalog indefinitely. Set REDIS_URL or CATALOG_SNAPSHOT=False."
+        ),
+        id="core.E001",
+    )]
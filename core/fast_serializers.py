@@ -0,0 +1,179 @@
+"""
+Plain-dict serializers for the hot catalog listings (products, banners,
+trending items).
+
+They produce exactly the JSON of ``ProductListSerializer``,
+``BannerSerializer`` and ``TrendingItemSerializer`` but work on ``.values()``
+rows (or catalog snapshot records, which also cover ``ProductDetailSerializer``)
+instead of model instances and skip DRF's per-field machinery:
+
+* scheme and host are resolved once per response instead of calling
+  ``request.build_absolute_uri`` for every URL, and file system storage
+  URLs skip ``urljoin``;
+* srcset formats are looked up once per response;
+* colors and sizes come from the product's summary columns (or the
+  snapshot's shared dicts) as they are.
+
+Decimals and datetimes still go through DRF's field classes so their
+formatting follows the REST_FRAMEWORK settings.  The DRF serializers remain
+the reference (and are used for write endpoints); the tests compare both
+byte for byte.
+"""
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+
+from .images import derivative_formats, srcset_urls
+from .metrics import timed_serializer
+from .models import Banner, Product, ProductImage, ProductQuerySet, TrendingItem
+
+PRODUCT_LIST_FIELDS = ProductQuerySet.LIST_FIELDS
+BANNER_FIELDS = ("id", "image", "image_widths", "link", "created_at")
+TRENDING_FIELDS = ("id", "name", "sub_name", "price", "image", "image_widths", "created_at")
+
+_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+_rating = serializers.DecimalField(max_digits=3, decimal_places=2)
+_datetime = serializers.DateTimeField()
+
+
+class MediaURLs:
+    """Absolute URLs for the files of one image field, for one request."""
+
+    def __init__(self, model, field, request=None):
+        self.storage = model._meta.get_field(field).storage
+        # FileSystemStorage.url() is urljoin(base_url, filepath_to_uri(name)), and urljoin only
+        # matters for dot segments; everything else is a plain concatenation.
+        self.base_url = self.storage.base_url if isinstance(self.storage, FileSystemStorage) else None
+        # build_absolute_uri() only prefixes scheme and host to a path.
+        self.host = request.build_absolute_uri("/")[:-1] if request else ""
+        self.formats = derivative_formats()
+
+    def url(self, name):
+        path = filepath_to_uri(name).lstrip("/") if self.base_url is not None else None
+        if path is not None and "/." not in "/" + path:
+            url = self.base_url + path
+        else:
+            url = self.storage.url(name)
+        if self.host and url.startswith("/") and not url.startswith("//"):
+            return self.host + url
+        return url
+
+    def srcset(self, name, widths):
+        if not name:
+            return {}
+        return srcset_urls(name, self.url, widths, self.formats)
+
+
+# --- Products ---
+@timed_serializer
+def serialize_product_list(rows, request=None):
+    """``ProductListSerializer(many=True).data`` for ``Product.objects.values(*PRODUCT_LIST_FIELDS)`` rows."""
+    media = MediaURLs(Product, "main_image", request)
+    images = MediaURLs(ProductImage, "image", request)
+    data = []
+    for row in rows:
+        image = row["main_image"]
+        data.append({
+            "id": row["id"],
+            "name": row["name"],
+            "sub_name": row["sub_name"],
+            "price": _price.to_representation(row["price"]),
+            "rating": _rating.to_representation(row["rating"]),
+            "main_image_url": media.url(image) if image else "",
+            "main_image_srcset": media.srcset(image, row["main_image_widths"]),
+            "colors": row["color_summary"],
+            "sizes": row["size_summary"],
+            "category": row["category"],
+            "image_count": row["image_count"],
+            "primary_image_url": images.url(row["primary_image"]) if row["primary_image"] else "",
+        })
+    return data
+
+
+# --- Banners / trending ---
+def _datetime_or_none(value):
+    return None if value is None else _datetime.to_representation(value)
+
+
+@timed_serializer
+def serialize_banners(rows, request=None):
+    """``BannerSerializer(many=True).data`` for ``Banner.objects.values(*BANNER_FIELDS)`` rows."""
+    media = MediaURLs(Banner, "image", request)
+    return [
+        {
+            "id": row["id"],
+            "srcset": media.srcset(row["image"], row["image_widths"]),
+            "image": media.url(row["image"]) if row["image"] else None,
+            "link": row["link"],
+            "created_at": _datetime_or_none(row["created_at"]),
+        }
+        for row in rows
+    ]
+
+
+@timed_serializer
+def serialize_trending(rows, request=None):
+    """``TrendingItemSerializer(many=True).data`` for ``TrendingItem.objects.values(*TRENDING_FIELDS)`` rows."""
+    media = MediaURLs(TrendingItem, "image", request)
+    return [
+        {
+            "id": row["id"],
+            "srcset": media.srcset(row["image"], row["image_widths"]),
+            "name": row["name"],
+            "sub_name": row["sub_name"],
+            "price": _price.to_representation(row["price"]),
+            "image": media.url(row["image"]) if row["image"] else None,
+            "created_at": _datetime_or_none(row["created_at"]),
+        }
+        for row in rows
+    ]
+
+
+# --- Catalog snapshot records (core.catalog) ---
+@timed_serializer
+def serialize_product_records(records, request=None):
+    """``ProductListSerializer(many=True).data`` for snapshot ``ProductRecord``s."""
+    media = MediaURLs(Product, "main_image", request)
+    images = MediaURLs(ProductImage, "image", request)
+    return [
+        {
+            "id": record.id,
+            "name": record.name,
+            "sub_name": record.sub_name,
+            "price": _price.to_representation(record.price),
+            "rating": _rating.to_representation(record.rating),
+            "main_image_url": media.url(record.main_image) if record.main_image else "",
+            "main_image_srcset": media.srcset(record.main_image, record.main_image_widths),
+            "colors": list(record.colors),
+            "sizes": list(record.sizes),
+            "category": record.category,
+            "image_count": len(record.images),
+            "primary_image_url": images.url(record.images[0][1]) if record.images else "",
+        }
+        for record in records
+    ]
+
+
+@timed_serializer
+def serialize_product_record_detail(record, request=None):
+    """``ProductDetailSerializer().data`` for a snapshot ``ProductRecord``."""
+    images = MediaURLs(ProductImage, "image", request)
+    secure_checkout = MediaURLs(Product, "secure_checkout_image", request)
+    size_help = MediaURLs(Product, "size_help_image", request)
+    return {
+        "id": record.id,
+        "name": record.name,
+        "sub_name": record.sub_name,
+        "price": _price.to_representation(record.price),
+        "rating": _rating.to_representation(record.rating),
+        "description": record.description,
+        "category": record.category,
+        "images": [
+            {"id": pk, "image": images.url(image) if image else None, "order": order, "srcset": images.srcset(image, widths)}
+            for pk, image, order, widths in record.images
+        ],
+        "colors": list(record.colors),
+        "sizes": list(record.sizes),
+        "secure_checkout_image": secure_checkout.url(record.secure_checkout_image) if record.secure_checkout_image else None,
+        "size_help_image": size_help.url(record.size_help_image) if record.size_help_image else None,
+    }
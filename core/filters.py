@@ -0,0 +1,37 @@
+import django_filters
+from django.db.models import Exists, OuterRef
+
+from .models import Product
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
+class ProductFilter(django_filters.FilterSet):
+    """
+    ?category=men&min_price=500&max_price=2000&min_rating=4&color=1,2&size=3
+
+    Several colors (or sizes) match a product offering any of them. The M2M
+    filters use EXISTS so the product rows are never duplicated by the join.
+    """
+    category = django_filters.CharFilter(field_name="category")
+    min_price = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
+    max_price = django_filters.NumberFilter(field_name="price", lookup_expr="lte")
+    min_rating = django_filters.NumberFilter(field_name="rating", lookup_expr="gte")
+    color = NumberInFilter(method="filter_colors")
+    size = NumberInFilter(method="filter_sizes")
+
+    class Meta:
+        model = Product
+        fields = ("category", "min_price", "max_price", "min_rating", "color", "size")
+
+    def filter_colors(self, queryset, name, value):
+        return queryset.filter(Exists(
+            Product.colors.through.objects.filter(product_id=OuterRef("pk"), color_id__in=value)
+        ))
+
+    def filter_sizes(self, queryset, name, value):
+        return queryset.filter(Exists(
+            Product.sizes.through.objects.filter(product_id=OuterRef("pk"), size_id__in=value)
+        ))
@@ -0,0 +1,188 @@
+"""
+Responsive image derivatives.
+
+Every uploaded catalog image gets resized copies at ``IMAGE_DERIVATIVE_WIDTHS``
+in each of ``IMAGE_DERIVATIVE_FORMATS``, stored next to the original:
+
+    products/shoe.png -> products/shoe__w320.webp, products/shoe__w640.jpg, ...
+
+Generation is scheduled from ``core.signals`` once the upload is committed
+and runs on a small background thread pool, never on the request thread.
+Afterwards the widths that exist in every format, and that the original is
+at least as wide as, are recorded on the row (``main_image_widths``,
+``image_widths``).  Serializers build ``srcset`` strings from those widths
+and the derived names without touching storage, so an image whose
+derivatives are missing (not generated yet, or generation failed) gets no
+``srcset`` rather than broken URLs.
+"""
+import logging
+import posixpath
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 1024)
+DEFAULT_FORMATS = ("avif", "webp", "jpeg")
+
+EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+
+# EXIF orientations that swap width and height.
+ORIENTATION = 0x0112
+ROTATED = (5, 6, 7, 8)
+
+SAVE_OPTIONS = {
+    "avif": {"quality": 60},
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+}
+
+
+def derivative_widths():
+    return tuple(getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", DEFAULT_WIDTHS))
+
+
+def derivative_formats():
+    formats = getattr(settings, "IMAGE_DERIVATIVE_FORMATS", DEFAULT_FORMATS)
+    # AVIF needs a Pillow build with libavif.
+    return tuple(fmt for fmt in formats if fmt != "avif" or features.check("avif"))
+
+
+def derivative_name(name, width, fmt):
+    root, _ = posixpath.splitext(name)
+    return f"{root}__w{width}.{EXTENSIONS[fmt]}"
+
+
+def _flatten(image):
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def generate_derivatives(name, storage=None, force=False):
+    """Write every missing derivative of ``name``; returns the names written."""
+    storage = storage or default_storage
+    targets = [
+        (width, fmt, derivative_name(name, width, fmt))
+        for width in derivative_widths()
+        for fmt in derivative_formats()
+    ]
+    if not force:
+        targets = [target for target in targets if not storage.exists(target[2])]
+    if not targets:
+        return []
+
+    with storage.open(name, "rb") as original:
+        image = _flatten(ImageOps.exif_transpose(Image.open(original)))
+
+    written = []
+    for width, fmt, target in targets:
+        # Never upscale: narrow originals are stored at their own width.
+        resized = image
+        if image.width > width:
+            resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(buffer.getvalue()))
+        written.append(target)
+    return written
+
+
+def available_widths(name, storage=None):
+    """
+    The derivative widths of ``name`` that exist in every format, leaving out
+    those wider than the original (which are stored at the original's width).
+    """
+    storage = storage or default_storage
+    with storage.open(name, "rb") as original:
+        image = Image.open(original)  # reads the header only
+        width, height = image.size
+        if image.getexif().get(ORIENTATION) in ROTATED:
+            width = height
+    return [
+        w for w in derivative_widths()
+        if w <= width and all(storage.exists(derivative_name(name, w, fmt)) for fmt in derivative_formats())
+    ]
+
+
+def _generate_safely(name, on_generated=None):
+    try:
+        generate_derivatives(name)
+        if on_generated is not None:
+            on_generated(name, available_widths(name))
+    except Exception:
+        logger.exception("Could not generate image derivatives for %s", name)
+
+
+def _generate_in_worker(name, on_generated=None):
+    # Executor threads outlive requests, so nothing closes their connections; a
+    # connection kept between jobs may have gone stale by the next ``on_generated`` write.
+    close_old_connections()
+    try:
+        _generate_safely(name, on_generated)
+    finally:
+        connection.close()
+
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2), thread_name_prefix="image-derivatives",
+        )
+    return _executor
+
+
+def schedule_derivatives(name, on_generated=None):
+    """
+    Generate derivatives for ``name`` after the current transaction commits,
+    then call ``on_generated(name, available_widths(name))``.
+    """
+    if not name or not getattr(settings, "IMAGE_DERIVATIVES_ENABLED", True):
+        return
+    if getattr(settings, "IMAGE_DERIVATIVES_ASYNC", True):
+        transaction.on_commit(lambda: _get_executor().submit(_generate_in_worker, name, on_generated))
+    else:
+        transaction.on_commit(lambda: _generate_safely(name, on_generated))
+
+
+def srcset_urls(name, url, widths, formats=None):
+    """
+    ``{"webp": "<url> 320w, <url> 640w, ...", ...}`` for the stored image
+    ``name`` and its recorded derivative ``widths``; ``url`` turns a storage
+    name into the URL to emit.
+    """
+    if not widths:
+        return {}
+    root, _ = posixpath.splitext(name)
+    result = {}
+    for fmt in derivative_formats() if formats is None else formats:
+        ext = EXTENSIONS[fmt]
+        result[fmt] = ", ".join(f"{url(f'{root}__w{width}.{ext}')} {width}w" for width in widths)
+    return result
+
+
+def srcset(field_file, widths, request=None):
+    """``srcset_urls`` for an image field value and its recorded widths."""
+    if not field_file:
+        return {}
+
+    def url(name):
+        location = field_file.storage.url(name)
+        return request.build_absolute_uri(location) if request else location
+
+    return srcset_urls(field_file.name, url, widths)
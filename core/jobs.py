@@ -0,0 +1,136 @@
+"""
+A small durable job queue on top of the ``Job`` table.
+
+Producers call :func:`enqueue` (or :func:`enqueue_mail`) inside their request;
+``manage.py run_jobs`` claims due jobs in batches, hands each batch of one
+kind to its registered handler and records the outcome.  Failed jobs are
+retried with exponential backoff until ``max_attempts`` is reached.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def register(kind):
+    """
+    Register a handler for ``kind``.  A handler receives a list of claimed
+    jobs and returns ``{job.pk: exception}`` for the ones that failed.
+    """
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload, run_after=None, max_attempts=None):
+    job = Job(kind=kind, payload=payload, run_after=run_after or timezone.now())
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+def backoff(attempts):
+    base = getattr(settings, "JOB_RETRY_BASE_SECONDS", 30)
+    cap = getattr(settings, "JOB_RETRY_MAX_SECONDS", 60 * 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def claim(batch_size):
+    """Mark up to ``batch_size`` due jobs as running and return them."""
+    now = timezone.now()
+    # Jobs left "running" by a worker that died are picked up again.
+    stale = now - timedelta(seconds=getattr(settings, "JOB_LOCK_TIMEOUT_SECONDS", 10 * 60))
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status="queued", run_after__lte=now) | Q(status="running", locked_at__lt=stale))
+            .order_by("run_after", "id")[:batch_size]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status="running", locked_at=now, attempts=F("attempts") + 1, updated_at=now,
+            )
+            for job in jobs:
+                job.status, job.locked_at, job.attempts = "running", now, job.attempts + 1
+    return jobs
+
+
+def run_pending(batch_size=50):
+    """Run one batch of due jobs; returns the number of jobs processed."""
+    jobs = claim(batch_size)
+    by_kind = {}
+    for job in jobs:
+        by_kind.setdefault(job.kind, []).append(job)
+
+    for kind, batch in by_kind.items():
+        handler = HANDLERS.get(kind)
+        if handler is None:
+            errors = {job.pk: LookupError(f"No handler registered for job kind {kind!r}") for job in batch}
+        else:
+            try:
+                errors = handler(batch) or {}
+            except Exception as exc:
+                errors = {job.pk: exc for job in batch}
+        finish(batch, errors)
+    return len(jobs)
+
+
+def finish(jobs, errors):
+    now = timezone.now()
+    done = [job.pk for job in jobs if job.pk not in errors]
+    if done:
+        Job.objects.filter(pk__in=done).update(status="done", locked_at=None, last_error="", updated_at=now)
+    for job in jobs:
+        exc = errors.get(job.pk)
+        if exc is None:
+            continue
+        if job.attempts >= job.max_attempts:
+            logger.error("Job %s (%s) failed permanently: %s", job.pk, job.kind, exc)
+            update = {"status": "failed"}
+        else:
+            logger.warning("Job %s (%s) failed, attempt %s: %s", job.pk, job.kind, job.attempts, exc)
+            update = {"status": "queued", "run_after": now + backoff(job.attempts)}
+        Job.objects.filter(pk=job.pk).update(locked_at=None, last_error=repr(exc), updated_at=now, **update)
+
+
+# --- Mail ---
+def enqueue_mail(subject, body, from_email, recipient_list):
+    return enqueue("send_mail", {
+        "subject": subject, "body": body, "from_email": from_email, "recipient_list": list(recipient_list),
+    })
+
+
+@register("send_mail")
+def send_mail_batch(jobs):
+    """Send every message of the batch over a single SMTP connection."""
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        return {job.pk: exc for job in jobs}
+    errors = {}
+    try:
+        for job in jobs:
+            message = EmailMessage(
+                job.payload["subject"], job.payload["body"], job.payload["from_email"],
+                job.payload["recipient_list"], connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:
+                errors[job.pk] = exc
+    finally:
+        connection.close()
+    return errors
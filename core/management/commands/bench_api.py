@@ -0,0 +1,171 @@
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.cache import VERSION_KEY, catalog_cache, get_version
+from core import catalog
+from core.models import CartItem, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the key API endpoints in-process against the current database (seed it with "
+        "seed_perf) and print p50/p95/p99 latency and query counts as JSON. Writes made by "
+        "the cart and checkout benchmarks are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200, help="Requests per endpoint.")
+        parser.add_argument("--users", type=int, default=100, help="How many users to spread requests over.")
+        parser.add_argument("--warm-cache", action="store_true",
+                            help="Keep the catalog response cache between requests (default: every request misses; "
+                                 "the catalog snapshot is kept either way).")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.warm_cache = options["warm_cache"]
+        self.users = list(User.objects.filter(cart__isnull=False).order_by("id")[:options["users"]])
+        self.product_ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+        if not self.users or not self.product_ids:
+            raise CommandError("Seed the database first (manage.py seed_perf).")
+        self.tokens = {user.pk: str(AccessToken.for_user(user)) for user in self.users}
+        self.offers = self.load_offers()
+
+        iterations = options["iterations"]
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "iterations": iterations,
+                "warm_cache": self.warm_cache,
+                "catalog_snapshot": catalog.enabled(),
+                "products": len(self.product_ids),
+                "seed": options["seed"],
+            },
+            "endpoints": {},
+        }
+        with transaction.atomic():
+            for name, bench in (
+                ("products-list", self.products_list),
+                ("products-list-filtered", self.products_list_filtered),
+                ("products-detail", self.products_detail),
+                ("cart-detail", self.cart_detail),
+                ("cart-add", self.cart_add),
+                ("checkout", self.checkout),
+                ("user_orders", self.user_orders),
+            ):
+                report["endpoints"][name] = self.measure(bench, iterations)
+            transaction.set_rollback(True)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output + "\n")
+        self.stdout.write(output)
+
+    def load_offers(self):
+        """A few valid (size, color) pairs per product, for cart-add and checkout."""
+        product_ids = self.rng.sample(self.product_ids, min(len(self.product_ids), 500))
+        sizes, colors = {}, {}
+        for product_id, size_id in Product.sizes.through.objects.filter(product_id__in=product_ids).values_list(
+            "product_id", "size_id"
+        ):
+            sizes.setdefault(product_id, []).append(size_id)
+        for product_id, color_id in Product.colors.through.objects.filter(product_id__in=product_ids).values_list(
+            "product_id", "color_id"
+        ):
+            colors.setdefault(product_id, []).append(color_id)
+        offers = [(pk, sizes[pk], colors[pk]) for pk in product_ids if pk in sizes and pk in colors]
+        if not offers:
+            raise CommandError("No product has both sizes and colors.")
+        return offers
+
+    # --- harness ---
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens[user.pk]}")
+        return client
+
+    def clear_responses(self):
+        """Empty the catalog response cache, but keep the group versions so the catalog snapshot stays warm."""
+        cache = catalog_cache()
+        versions = {group: get_version(group) for group in ("products", "banners", "trending")}
+        cache.clear()
+        for group, version in versions.items():
+            cache.set(VERSION_KEY.format(group=group), version, None)
+
+    def measure(self, bench, iterations):
+        timings, queries, statuses = [], [], {}
+        for _ in range(iterations):
+            if not self.warm_cache:
+                self.clear_responses()
+            # A bench returns (client, method, path, data); setup requests happen before timing.
+            client, method, path, data = bench()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = getattr(client, method)(path, data, format="json") if data else getattr(client, method)(path)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        percentiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+        return {
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(percentiles[94], 3),
+            "p99_ms": round(percentiles[98], 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "queries": {"min": min(queries), "median": statistics.median(queries), "max": max(queries)},
+            "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        }
+
+    def offer_payload(self):
+        product_id, sizes, colors = self.rng.choice(self.offers)
+        return {"product_id": product_id, "size_id": self.rng.choice(sizes),
+                "color_id": self.rng.choice(colors), "quantity": 1}
+
+    # --- endpoints ---
+    def products_list(self):
+        return self.client_for(), "get", "/api/products/", None
+
+    def products_list_filtered(self):
+        category = self.rng.choice(("men", "women", "kids"))
+        return self.client_for(), "get", f"/api/products/?category={category}&max_price=5000&min_rating=3", None
+
+    def products_detail(self):
+        return self.client_for(), "get", f"/api/products/{self.rng.choice(self.product_ids)}/", None
+
+    def cart_detail(self):
+        return self.client_for(self.rng.choice(self.users)), "get", "/api/cart/", None
+
+    def cart_add(self):
+        return self.client_for(self.rng.choice(self.users)), "post", "/api/cart/add/", self.offer_payload()
+
+    def checkout(self):
+        user = self.rng.choice(self.users)
+        offer = self.offer_payload()
+        # Make sure there is something to buy; not part of the timing.
+        CartItem.objects.update_or_create(
+            cart=user.cart, product_id=offer["product_id"], size_id=offer["size_id"], color_id=offer["color_id"],
+            defaults={"quantity": 1},
+        )
+        shipping = {"name": "Bench User", "city": "Chennai", "pincode": "600001"}
+        return self.client_for(user), "post", "/api/checkout/", {"shipping_address": shipping}
+
+    def user_orders(self):
+        return self.client_for(self.rng.choice(self.users)), "get", "/api/orders/", None
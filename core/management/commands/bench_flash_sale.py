@@ -0,0 +1,124 @@
+import json
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Color, Order, OrderItem, Product, ProductVariant, Size
+
+from .seed_perf import USERNAME_PREFIX
+
+SHIPPING = {"name": "Flash Buyer", "city": "Chennai", "pincode": "600001"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Flash-sale contention benchmark: many buyers check out the same few variants (SKUs) "
+        "at once through /api/checkout/. Reports sold vs. rejected checkouts, overselling and "
+        "latency as JSON. Needs the users from seed_perf; the sale product and its orders are "
+        "deleted afterwards unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stock", type=int, default=100, help="Units in stock per SKU.")
+        parser.add_argument("--skus", type=int, default=1, help="Number of hot variants.")
+        parser.add_argument("--buyers", type=int, default=500, help="Checkout attempts in total.")
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--quantity", type=int, default=1, help="Units per checkout.")
+        parser.add_argument("--keep", action="store_true", help="Keep the sale product and its orders.")
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(username__startswith=USERNAME_PREFIX).order_by("id")[:options["buyers"]])
+        if not users:
+            raise CommandError("Seed the database first (manage.py seed_perf).")
+        product, skus = self.create_sale(options["skus"], options["stock"])
+        try:
+            report = self.run_sale(product, skus, users, options)
+        finally:
+            if not options["keep"]:
+                Order.objects.filter(pk__in=OrderItem.objects.filter(product_id=product.pk).values("order_id")).delete()
+                product.delete()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def create_sale(self, count, stock):
+        colors = list(Color.objects.order_by("id")[:count])
+        sizes = list(Size.objects.order_by("id")[:1])
+        if len(colors) < count or not sizes:
+            raise CommandError("Not enough colors or sizes for that many SKUs.")
+        product = Product.objects.create(name="Flash Sale Runner", sub_name="Limited Edition",
+                                         price=Decimal("4999.00"), category="men")
+        product.colors.set(colors)
+        product.sizes.set(sizes)
+        ProductVariant.objects.filter(product=product).update(stock=stock)
+        skus = list(ProductVariant.objects.filter(product=product).values_list("size_id", "color_id"))
+        return product, skus
+
+    def run_sale(self, product, skus, users, options):
+        attempts = options["buyers"]
+        quantity = options["quantity"]
+        tokens = {user.pk: str(AccessToken.for_user(user)) for user in users}
+        lock = threading.Lock()
+        next_attempt = iter(range(attempts))
+        timings, statuses = [], {}
+
+        def buyer():
+            client = APIClient()
+            try:
+                while True:
+                    with lock:
+                        n = next(next_attempt, None)
+                    if n is None:
+                        return
+                    user = users[n % len(users)]
+                    size_id, color_id = skus[n % len(skus)]
+                    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens[user.pk]}")
+                    payload = {"shipping_address": SHIPPING, "items": [{
+                        "product_id": product.pk, "size_id": size_id, "color_id": color_id, "quantity": quantity,
+                    }]}
+                    start = time.perf_counter()
+                    response = client.post("/api/checkout/", payload, format="json")
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        timings.append(elapsed)
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connection.close()
+
+        start = time.perf_counter()
+        if options["threads"] == 1:
+            buyer()
+        else:
+            threads = [threading.Thread(target=buyer) for _ in range(options["threads"])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        wall = time.perf_counter() - start
+
+        initial_stock = options["stock"] * len(skus)
+        sold = sum(OrderItem.objects.filter(product_id=product.pk).values_list("quantity", flat=True))
+        final_stock = sum(ProductVariant.objects.filter(product=product).values_list("stock", flat=True))
+        percentiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+        return {
+            "database": connection.vendor,
+            "skus": len(skus),
+            "threads": options["threads"],
+            "attempts": attempts,
+            "statuses": {str(code): count for code, count in sorted(statuses.items())},
+            "initial_stock": initial_stock,
+            "sold_units": sold,
+            "final_stock": final_stock,
+            "oversold_units": max(sold - initial_stock, 0),
+            "consistent": sold + final_stock == initial_stock,
+            "checkouts_per_second": round(attempts / wall, 1),
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(percentiles[94], 3),
+            "p99_ms": round(percentiles[98], 3),
+        }
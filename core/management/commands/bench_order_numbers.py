@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+from django.test.utils import override_settings
+
+from core.models import Order
+
+SCHEMES = {
+    "random": "core.order_numbers.random_order_number",
+    "snowflake": "core.order_numbers.snowflake_order_number",
+}
+
+
+class Command(BaseCommand):
+    help = "Compare order insert throughput for each order number scheme (changes are rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=5000)
+        parser.add_argument("--rounds", type=int, default=3)
+
+    def handle(self, *args, **options):
+        for name, path in SCHEMES.items():
+            rates, collisions = [], 0
+            for _ in range(options["rounds"]):
+                with override_settings(ORDER_NUMBER_GENERATOR=path):
+                    rate, failed = self.run_round(options["orders"])
+                rates.append(rate)
+                collisions += failed
+            self.stdout.write(
+                f"{name:<10} {max(rates):>10.0f} orders/s  (best of {options['rounds']}), "
+                f"{collisions} unique-constraint collisions"
+            )
+
+    def run_round(self, count):
+        collisions = 0
+        with transaction.atomic():
+            user = User.objects.create_user(username="bench-order-numbers")
+            start = time.perf_counter()
+            for _ in range(count):
+                try:
+                    # Each insert gets a savepoint, as a collision would otherwise abort the round.
+                    with transaction.atomic():
+                        Order.objects.create(user=user, total_price=0, shipping_address={})
+                except IntegrityError:
+                    collisions += 1
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return count / elapsed, collisions
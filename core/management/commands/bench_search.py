@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from core import search
+from core.models import Product
+
+SYLLABLES = "ka ro mi tu ze la vo ni sa pe qu di fo ga hu".split()
+# ~3k pseudo-words, so a term matches a realistic slice of the catalog
+# rather than a fixed fraction of it.
+WORDS = sorted({a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES})
+
+
+class Command(BaseCommand):
+    help = (
+        "Time full-text product searches at growing catalog sizes. "
+        "Synthetic products are created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="Comma-separated catalog sizes to measure.")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        rng = random.Random(options["seed"])
+        queries = [" ".join(rng.sample(WORDS, rng.choice((1, 2)))) for _ in range(options["queries"])]
+        self.stdout.write(f"backend: {search.search_backend() or 'icontains fallback'}")
+
+        with transaction.atomic():
+            created = 0
+            for size in sizes:
+                self.create_products(size - created, rng)
+                created = size
+                indexed = self.time_queries(search.search_product_ids, queries)
+                scanned = self.time_queries(self.icontains_ids, queries)
+                self.stdout.write(
+                    f"{size:>8} products  index p50 {statistics.median(indexed):7.2f} ms"
+                    f" p95 {statistics.quantiles(indexed, n=20)[-1]:7.2f} ms"
+                    f"  | icontains p50 {statistics.median(scanned):7.2f} ms"
+                )
+            transaction.set_rollback(True)
+
+    def create_products(self, count, rng, batch_size=5000):
+        for start in range(0, count, batch_size):
+            products = Product.objects.bulk_create([
+                Product(
+                    name=" ".join(rng.sample(WORDS, 3)).title(),
+                    sub_name=rng.choice(WORDS).title(),
+                    description=" ".join(rng.choices(WORDS, k=20)),
+                    price=rng.randint(500, 9000),
+                    category=rng.choice(("men", "women", "kids")),
+                )
+                for _ in range(min(batch_size, count - start))
+            ])
+            # bulk_create skips post_save, so index explicitly.
+            search.index_products(products)
+
+    def icontains_ids(self, query, limit):
+        # What the API and admin did before the index existed.
+        qs = Product.objects.all()
+        for token in query.split():
+            qs = qs.filter(Q(name__icontains=token) | Q(sub_name__icontains=token) | Q(description__icontains=token))
+        return list(qs.values_list("id", flat=True)[:limit])
+
+    def time_queries(self, find, queries):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            find(query, limit=24)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
@@ -0,0 +1,73 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from core.fast_serializers import (
+    BANNER_FIELDS, PRODUCT_LIST_FIELDS, TRENDING_FIELDS,
+    serialize_banners, serialize_product_list, serialize_trending,
+)
+from core.models import Banner, Product, TrendingItem
+from core.serializers import BannerSerializer, ProductListSerializer, TrendingItemSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the CPU cost per item of the DRF list serializers and core.fast_serializers "
+        "on rows from the current database (seed it with seed_perf). Rows are fetched once; "
+        "only serialization is timed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=1000, help="Rows per listing.")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        items, repeat = options["items"], options["repeat"]
+        request = Request(RequestFactory().get("/api/products/"))
+        context = {"request": request}
+
+        products = list(Product.objects.for_list().order_by("-created_at")[:items])
+        if not products:
+            raise CommandError("Seed the database first (manage.py seed_perf).")
+        rows = list(Product.objects.order_by("-created_at").values(*PRODUCT_LIST_FIELDS)[:items])
+        banners = list(Banner.objects.all()[:items])
+        banner_rows = list(Banner.objects.values(*BANNER_FIELDS)[:items])
+        trending = list(TrendingItem.objects.all()[:items])
+        trending_rows = list(TrendingItem.objects.values(*TRENDING_FIELDS)[:items])
+
+        report = {}
+        for name, count, drf, fast in (
+            ("products", len(products),
+             lambda: ProductListSerializer(products, many=True, context=context).data,
+             lambda: serialize_product_list(rows, request)),
+            ("banners", len(banners),
+             lambda: BannerSerializer(banners, many=True, context=context).data,
+             lambda: serialize_banners(banner_rows, request)),
+            ("trending", len(trending),
+             lambda: TrendingItemSerializer(trending, many=True, context=context).data,
+             lambda: serialize_trending(trending_rows, request)),
+        ):
+            if not count:
+                continue
+            drf_us = self.measure(drf, count, repeat)
+            fast_us = self.measure(fast, count, repeat)
+            report[name] = {
+                "items": count,
+                "drf_us_per_item": drf_us,
+                "fast_us_per_item": fast_us,
+                "speedup": round(drf_us / fast_us, 2) if fast_us else None,
+            }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, serialize, count, repeat):
+        """Median microseconds per item over ``repeat`` runs."""
+        timings = []
+        for _ in range(repeat):
+            start = time.process_time()
+            serialize()
+            timings.append(time.process_time() - start)
+        return round(statistics.median(timings) / count * 1_000_000, 2)
@@ -0,0 +1,17 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.cache import get_version
+from core.catalog import build_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the in-process catalog snapshot (core.catalog) from the current database and "
+        "print its size, build time and memory footprint, also per 10k products, as JSON."
+    )
+
+    def handle(self, *args, **options):
+        snapshot = build_snapshot(get_version("products"))
+        self.stdout.write(json.dumps(snapshot.stats(), indent=2))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.images import available_widths, generate_derivatives
+from core.signals import IMAGE_FIELDS, record_image_widths
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate missing responsive derivatives for every catalog image (e.g. after changing widths) "
+        "and record the widths that serializers put in srcset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate derivatives that already exist.")
+
+    def handle(self, *args, **options):
+        written = failed = 0
+        for model, field in IMAGE_FIELDS.items():
+            names = model.objects.exclude(**{field: ""}).exclude(**{f"{field}__isnull": True})
+            for name in names.values_list(field, flat=True).distinct().iterator():
+                try:
+                    written += len(generate_derivatives(name, force=options["force"]))
+                    record_image_widths(model, name, available_widths(name))
+                except (OSError, ValueError) as exc:
+                    failed += 1
+                    self.stderr.write(f"{name}: {exc}")
+        self.stdout.write(f"Wrote {written} derivatives, {failed} originals failed.")
@@ -0,0 +1,180 @@
+import http.client
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Product
+
+# name -> (sync path, async path, needs a token)
+ENDPOINTS = {
+    "cart-count": ("/api/cart/count/", "/api/async/cart/count/", True),
+    "cart": ("/api/cart/", "/api/async/cart/", True),
+    "products": ("/api/products/", "/api/async/products/", False),
+    "product": ("/api/products/{product}/", "/api/async/products/{product}/", False),
+    "orders": ("/api/orders/", "/api/async/orders/", True),
+}
+
+SERVERS = {
+    # server -> (module, command line after "python -m <module>")
+    "gunicorn": ("gunicorn", lambda o: [
+        "backend.wsgi:application", "--bind", f"127.0.0.1:{o['port']}", "--workers", str(o["workers"]),
+        "--worker-class", "gthread", "--threads", str(o["threads"]), "--log-level", "warning",
+    ]),
+    "uvicorn": ("uvicorn", lambda o: [
+        "backend.asgi:application", "--port", str(o["port"]), "--workers", str(o["workers"]),
+        "--no-access-log", "--log-level", "warning",
+    ]),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the hot read endpoints against the current database: gunicorn (WSGI) serves "
+        "the sync views, uvicorn (ASGI) serves both the sync and the async views. Reports "
+        "requests/sec and p50/p99 latency per endpoint. Use the same worker count for both "
+        "servers, and run the client on another machine for numbers above a few thousand rps."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", default="gunicorn,uvicorn", help="Comma-separated: gunicorn, uvicorn.")
+        parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated endpoint names.")
+        parser.add_argument("--base-url", help="Test an already running server instead of spawning one.")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=8, help="gunicorn gthread threads per worker.")
+        parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client connections.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint.")
+        parser.add_argument("--warmup", type=float, default=1.0, help="Seconds per endpoint, not measured.")
+        parser.add_argument("--username", help="User whose token is sent; defaults to the first user with a cart.")
+        parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options["endpoints"].split(",") if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        if settings.DEBUG:
+            self.stderr.write("DEBUG is on: every query is recorded in memory, expect lower numbers.")
+
+        product = Product.objects.order_by("id").values_list("id", flat=True).first()
+        if product is None and "product" in endpoints:
+            raise CommandError("No products in the database; seed some first.")
+        headers = {}
+        if any(ENDPOINTS[name][2] for name in endpoints):
+            headers["Authorization"] = f"Bearer {self.get_token(options['username'])}"
+
+        results = []
+        servers = [name.strip() for name in options["servers"].split(",") if name.strip()]
+        for server in servers:
+            if server not in SERVERS:
+                raise CommandError(f"Unknown server {server!r}")
+            process = None if options["base_url"] else self.start_server(server, options)
+            base_url = options["base_url"] or f"http://127.0.0.1:{options['port']}"
+            try:
+                self.wait_until_ready(base_url)
+                for name in endpoints:
+                    sync_path, async_path, _ = ENDPOINTS[name]
+                    # WSGI cannot run the async views without a thread hop per request.
+                    paths = [("sync", sync_path)] + ([("async", async_path)] if server == "uvicorn" else [])
+                    for kind, path in paths:
+                        path = path.format(product=product)
+                        self.run_load(base_url, path, headers, options["concurrency"], options["warmup"])
+                        stats = self.run_load(base_url, path, headers, options["concurrency"], options["duration"])
+                        stats.update(server=server, endpoint=name, view=kind, path=path)
+                        results.append(stats)
+                        if not options["json"]:
+                            self.write_row(stats)
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait(timeout=10)
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def get_token(self, username):
+        users = User.objects.order_by("id")
+        user = users.filter(username=username).first() if username else users.filter(cart__isnull=False).first()
+        if user is None:
+            raise CommandError("No user to authenticate as; pass --username.")
+        return AccessToken.for_user(user)
+
+    def start_server(self, server, options):
+        module, build_args = SERVERS[server]
+        if importlib.util.find_spec(module) is None:
+            raise CommandError(f"{module} is not installed (pip install {module}).")
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "backend.settings")}
+        return subprocess.Popen([sys.executable, "-m", module, *build_args(options)], cwd=settings.BASE_DIR, env=env)
+
+    def wait_until_ready(self, base_url, timeout=30):
+        deadline = time.monotonic() + timeout
+        url = urlsplit(base_url)
+        while time.monotonic() < deadline:
+            try:
+                connection = http.client.HTTPConnection(url.hostname, url.port, timeout=2)
+                connection.request("GET", "/api/products/?page_size=1")
+                connection.getresponse().read()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"Server at {base_url} did not come up within {timeout}s.")
+
+    def run_load(self, base_url, path, headers, concurrency, duration):
+        url = urlsplit(base_url)
+        deadline = time.monotonic() + duration
+        latencies, errors, lock = [], [0], threading.Lock()
+
+        def client():
+            connection = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+            local, failed = [], 0
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status >= 400:
+                        failed += 1
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    connection.close()
+                    continue
+                local.append((time.perf_counter() - start) * 1000)
+            connection.close()
+            with lock:
+                latencies.extend(local)
+                errors[0] += failed
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        stats = {"requests": len(latencies), "errors": errors[0], "rps": len(latencies) / elapsed}
+        if len(latencies) >= 2:
+            percentiles = statistics.quantiles(latencies, n=100)
+            stats.update(p50_ms=statistics.median(latencies), p99_ms=percentiles[98])
+        else:
+            stats.update(p50_ms=None, p99_ms=None)
+        return stats
+
+    def write_row(self, stats):
+        p50 = f"{stats['p50_ms']:8.2f}" if stats["p50_ms"] is not None else "       -"
+        p99 = f"{stats['p99_ms']:8.2f}" if stats["p99_ms"] is not None else "       -"
+        self.stdout.write(
+            f"{stats['server']:<9} {stats['view']:<5} {stats['endpoint']:<11} {stats['rps']:9.0f} req/s"
+            f"  p50 {p50} ms  p99 {p99} ms  errors {stats['errors']}"
+        )
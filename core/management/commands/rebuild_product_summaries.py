@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.cache import bump_version
+from core.models import Product, ProductQuerySet
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized listing summaries (colors, sizes, image count, primary image) "
+        "of every product, e.g. after bulk_create or raw SQL, and report how many were out of date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        batch_size = options["batch_size"]
+        ids = list(Product.objects.order_by("id").values_list("pk", flat=True))
+        stale = 0
+        for offset in range(0, len(ids), batch_size):
+            batch = Product.objects.filter(pk__in=ids[offset:offset + batch_size])
+            old = {row.pop("id"): row for row in batch.values("id", *ProductQuerySet.SUMMARY_FIELDS)}
+            for pk, summary in batch.refresh_summaries().items():
+                stale += summary != old[pk]
+        if stale:
+            bump_version("products")
+        self.stdout.write(
+            f"Rebuilt the summaries of {len(ids)} products in {time.perf_counter() - start:.1f}s; "
+            f"{stale} were out of date."
+        )
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs (contact form mail, ...)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_pending(options["batch_size"])
+            if processed:
+                self.stdout.write(f"Processed {processed} job(s)")
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,178 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import search
+from core.cache import bump_version
+from core.models import Cart, CartItem, Color, Order, OrderItem, Product, ProductImage, ProductVariant, Size
+from core.order_numbers import snowflake_order_number
+
+USERNAME_PREFIX = "perf-user-"
+PASSWORD = "perf-password"
+
+COLORS = (
+    ("Black", "#000000"), ("White", "#ffffff"), ("Red", "#d32f2f"), ("Navy", "#1a237e"),
+    ("Grey", "#9e9e9e"), ("Olive", "#556b2f"), ("Beige", "#f5f5dc"), ("Pink", "#f48fb1"),
+    ("Teal", "#00897b"), ("Orange", "#fb8c00"), ("Brown", "#6d4c41"), ("Volt", "#cddc39"),
+)
+SIZES = ("UK 3", "UK 4", "UK 5", "UK 6", "UK 7", "UK 8", "UK 9", "UK 10", "UK 11", "UK 12")
+
+ADJECTIVES = ("Air", "Ultra", "Swift", "Cloud", "Trail", "Street", "Retro", "Flex", "Storm", "Pulse",
+              "Zoom", "Court", "Urban", "Summit", "Glide", "Volt", "Nova", "Terra", "Pro", "Lite")
+NOUNS = ("Runner", "Racer", "Trainer", "Walker", "Sneaker", "Boot", "Slip-On", "Loafer", "Sandal", "Cleat")
+SUB_NAMES = ("Men's Running Shoe", "Women's Running Shoe", "Kids' Shoe", "Training Shoe",
+             "Lifestyle Shoe", "Trail Shoe", "Basketball Shoe", "Walking Shoe")
+DESCRIPTION_WORDS = ("breathable mesh upper cushioned midsole durable rubber outsole lightweight "
+                     "responsive foam heel counter padded collar grippy traction everyday comfort "
+                     "recycled knit waterproof supportive arch flexible forefoot reflective details").split()
+CITIES = ("Chennai", "Bengaluru", "Mumbai", "Delhi", "Hyderabad", "Pune", "Kolkata", "Kochi")
+ORDER_STATUSES = ("Delivered",) * 6 + ("Shipped", "Processing", "Pending", "Cancelled")
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a large, realistic data set for benchmarks (see bench_api): "
+        "products with colors, sizes, stocked variants and images, users with carts, and order history. "
+        "Rows are written with bulk_create, so run it on an empty or disposable database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--users", type=int, default=50_000)
+        parser.add_argument("--order-items", type=int, default=1_000_000)
+        parser.add_argument("--images-per-product", type=int, default=3)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError("This database is already seeded; run it on a fresh one (e.g. after `manage.py flush`).")
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        colors, sizes = self.step("colors and sizes", self.seed_options)
+        products = self.step("products", self.seed_products, options["products"], colors, sizes,
+                             options["images_per_product"])
+        users = self.step("users and carts", self.seed_users, options["users"], products)
+        self.step("orders", self.seed_orders, options["order_items"], users, products, colors, sizes)
+        self.step("search index", search.rebuild_index)
+        bump_version("products")
+
+    def step(self, label, func, *args):
+        start = time.perf_counter()
+        with transaction.atomic():
+            result = func(*args)
+        self.stdout.write(f"{label:<16} {time.perf_counter() - start:8.1f}s")
+        return result
+
+    def batches(self, count):
+        for start in range(0, count, self.batch_size):
+            yield range(start, min(start + self.batch_size, count))
+
+    def seed_options(self):
+        colors = [Color.objects.get_or_create(name=name, defaults={"hex": hex})[0] for name, hex in COLORS]
+        sizes = [Size.objects.get_or_create(value=value)[0] for value in SIZES]
+        return colors, sizes
+
+    def seed_products(self, count, colors, sizes, images_per_product):
+        """Returns ``[(product_id, name, price, color_ids, size_ids), ...]`` for the later steps."""
+        rng = self.rng
+        catalog = []
+        for batch in self.batches(count):
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f"{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+                    sub_name=rng.choice(SUB_NAMES),
+                    description=" ".join(rng.choices(DESCRIPTION_WORDS, k=30)),
+                    price=Decimal(rng.randrange(999, 19999, 100)),
+                    rating=Decimal(rng.randint(250, 500)) / 100,
+                    category=rng.choice(("men", "women", "kids")),
+                    main_image=f"products/perf/shoe_{i % 500}.jpg",
+                )
+                for i in batch
+            ])
+            color_rows, size_rows, variants, images = [], [], [], []
+            for product in products:
+                color_ids = [color.pk for color in rng.sample(colors, rng.randint(2, 4))]
+                size_ids = [size.pk for size in rng.sample(sizes, rng.randint(4, 7))]
+                color_rows += [Product.colors.through(product_id=product.pk, color_id=pk) for pk in color_ids]
+                size_rows += [Product.sizes.through(product_id=product.pk, size_id=pk) for pk in size_ids]
+                # bulk_create skips the m2m signals that normally create the variants
+                variants += [
+                    ProductVariant(product=product, color_id=color_id, size_id=size_id, stock=rng.randint(10, 200))
+                    for color_id in color_ids for size_id in size_ids
+                ]
+                images += [
+                    ProductImage(product=product, image=f"products/perf/shoe_{product.pk % 500}_{n}.jpg", order=n)
+                    for n in range(images_per_product)
+                ]
+                catalog.append((product.pk, product.name, product.price, color_ids, size_ids))
+            Product.colors.through.objects.bulk_create(color_rows)
+            Product.sizes.through.objects.bulk_create(size_rows)
+            ProductVariant.objects.bulk_create(variants, batch_size=self.batch_size)
+            ProductImage.objects.bulk_create(images, batch_size=self.batch_size)
+            # ... and the ones that keep the listing summaries current
+            Product.objects.filter(pk__in=[product.pk for product in products]).refresh_summaries()
+        return catalog
+
+    def seed_users(self, count, catalog):
+        rng = self.rng
+        password = make_password(PASSWORD)  # hashing is slow, so every user shares one hash
+        user_ids = []
+        for batch in self.batches(count):
+            users = User.objects.bulk_create([
+                User(username=f"{USERNAME_PREFIX}{i:06d}", email=f"{USERNAME_PREFIX}{i:06d}@example.com",
+                     password=password)
+                for i in batch
+            ])
+            carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+            items = []
+            for cart in carts:
+                # Most carts hold a few items, some are empty.
+                picked = rng.sample(catalog, min(rng.choice((0, 1, 2, 3, 5)), len(catalog)))
+                for product_id, _, _, color_ids, size_ids in picked:
+                    items.append(CartItem(cart=cart, product_id=product_id, size_id=rng.choice(size_ids),
+                                          color_id=rng.choice(color_ids), quantity=rng.randint(1, 3)))
+            CartItem.objects.bulk_create(items, batch_size=self.batch_size)
+            user_ids += [user.pk for user in users]
+        return user_ids
+
+    def seed_orders(self, item_count, user_ids, catalog, colors, sizes):
+        rng = self.rng
+        color_names = {color.pk: color.name for color in colors}
+        size_values = {size.pk: size.value for size in sizes}
+        written = 0
+        while written < item_count:
+            orders, lines, pending = [], [], 0
+            while pending < self.batch_size and written + pending < item_count:
+                order_lines = []
+                size = min(rng.randint(1, 7), len(catalog), item_count - written - pending)
+                for product_id, name, price, color_ids, size_ids in rng.sample(catalog, size):
+                    order_lines.append(OrderItem(
+                        product_id=product_id, product_name=name, unit_price=price, quantity=rng.randint(1, 2),
+                        main_image_url=f"/media/products/perf/shoe_{product_id % 500}.jpg",
+                        size=size_values[rng.choice(size_ids)], color=color_names[rng.choice(color_ids)],
+                    ))
+                orders.append(Order(
+                    user_id=rng.choice(user_ids),
+                    # bulk_create skips Order.save(), which normally assigns the number.
+                    order_number=snowflake_order_number(),
+                    total_price=sum(line.unit_price * line.quantity for line in order_lines),
+                    shipping_address={"name": "Perf User", "city": rng.choice(CITIES), "pincode": "600001"},
+                    payment_status="Paid", status=rng.choice(ORDER_STATUSES),
+                ))
+                lines.append(order_lines)
+                pending += len(order_lines)
+            orders = Order.objects.bulk_create(orders)
+            items = []
+            for order, order_lines in zip(orders, lines):
+                for line in order_lines:
+                    line.order = order
+                    items.append(line)
+            OrderItem.objects.bulk_create(items)
+            written += len(items)
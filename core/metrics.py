@@ -0,0 +1,284 @@
+"""
+Per-endpoint request metrics, exported as Prometheus text on ``/metrics/``.
+
+``PerformanceMetricsMiddleware`` records, for each resolved view name
+(``products-list``, ``cart-detail``, ``checkout``, ...):
+
+* wall time (histogram)
+* number of SQL queries (histogram) and time spent in the database
+* time spent in serializer ``to_representation``
+* response size
+
+Queries are counted by an ``execute_wrapper`` installed on every database
+connection; it reads the current request from a context variable, so it
+also sees the queries async views run through ``sync_to_async``.  A request
+that runs more queries than its budget (``PERF_QUERY_BUDGETS[view]``, else
+``PERF_QUERY_BUDGET``) is logged as a warning.
+
+Metrics are kept in process memory: with several workers, each one serves
+its own numbers on ``/metrics/``.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = ContextVar("request_metrics", default=None)
+_serializing = ContextVar("serializing", default=False)
+
+
+class RequestMetrics:
+    __slots__ = ("queries", "db_time", "serializer_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+
+# --- collection ---
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """Add ``record_query`` to a connection; used as a ``connection_created`` receiver."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent in ``to_representation`` to the current request.
+    Only the outermost serializer is timed, so nested serializers and
+    ``many=True`` children are not counted twice.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or _serializing.get():
+            return super().to_representation(instance)
+        token = _serializing.set(True)
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            _serializing.reset(token)
+
+
+def timed_serializer(func):
+    """``TimedSerializerMixin`` for plain serializer functions (see core.fast_serializers)."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        metrics = _current.get()
+        if metrics is None or _serializing.get():
+            return func(*args, **kwargs)
+        token = _serializing.set(True)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            _serializing.reset(token)
+    return wrapper
+
+
+# --- storage ---
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class ViewStats:
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.response_bytes = 0
+        self.budget_exceeded = 0
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_bound(bound):
+    return f"{bound:g}"
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def get(self, view, method):
+        return self.views.get((view, method))
+
+    def record(self, view, method, status, wall, metrics, size, budget_exceeded=False):
+        with self.lock:
+            stats = self.views.get((view, method))
+            if stats is None:
+                stats = self.views[(view, method)] = ViewStats()
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.latency.observe(wall)
+            stats.queries.observe(metrics.queries)
+            stats.db_seconds += metrics.db_time
+            stats.serializer_seconds += metrics.serializer_time
+            stats.response_bytes += size
+            stats.budget_exceeded += budget_exceeded
+
+    def render(self):
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = []
+
+            def header(name, kind, help_text):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            header("http_requests_total", "counter", "Requests by view, method and status.")
+            for (view, method), stats in views:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f"http_requests_total{_labels(view=view, method=method, status=status)} {count}")
+
+            for name, attr, help_text in (
+                ("http_request_duration_seconds", "latency", "Wall time per request."),
+                ("db_queries_per_request", "queries", "SQL queries per request."),
+            ):
+                header(name, "histogram", help_text)
+                for (view, method), stats in views:
+                    histogram = getattr(stats, attr)
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        labels = _labels(view=view, method=method, le=_format_bound(bound))
+                        lines.append(f"{name}_bucket{labels} {count}")
+                    labels = _labels(view=view, method=method, le="+Inf")
+                    lines.append(f"{name}_bucket{labels} {histogram.count}")
+                    labels = _labels(view=view, method=method)
+                    lines.append(f"{name}_sum{labels} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{labels} {histogram.count}")
+
+            for name, attr, help_text in (
+                ("db_query_duration_seconds_total", "db_seconds", "Time spent running SQL."),
+                ("serializer_duration_seconds_total", "serializer_seconds", "Time spent in serializers."),
+                ("http_response_size_bytes_total", "response_bytes", "Response body bytes sent."),
+                ("query_budget_exceeded_total", "budget_exceeded", "Requests over their query budget."),
+            ):
+                header(name, "counter", help_text)
+                for (view, method), stats in views:
+                    value = getattr(stats, attr)
+                    value = f"{value:.6f}" if isinstance(value, float) else value
+                    lines.append(f"{name}{_labels(view=view, method=method)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# --- middleware ---
+def query_budget(resolver_match):
+    budgets = getattr(settings, "PERF_QUERY_BUDGETS", {})
+    if resolver_match.view_name in budgets:
+        return budgets[resolver_match.view_name]
+    # The admin is not held to the API budget unless listed explicitly.
+    if resolver_match.namespace == "admin":
+        return None
+    return getattr(settings, "PERF_QUERY_BUDGET", None)
+
+
+class PerformanceMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        metrics, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics, time.perf_counter() - start)
+        return response
+
+    def start(self):
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection=connection)
+        metrics = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    def finish(self, request, response, metrics, wall):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unresolved"
+        size = 0 if response.streaming else len(response.content)
+
+        budget = query_budget(match) if match else None
+        exceeded = budget is not None and metrics.queries > budget
+        if exceeded:
+            logger.warning(
+                "Query budget exceeded: %s %s (%s) ran %d queries, budget %d (%.1f ms in the database)",
+                request.method, request.path, view, metrics.queries, budget, metrics.db_time * 1000,
+            )
+        REGISTRY.record(view, request.method, response.status_code, wall, metrics, size, exceeded)
+
+
+def metrics_view(request):
+    """Prometheus text exposition; requires ``Bearer <METRICS_TOKEN>`` when that setting is set."""
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Existing color/size combinations were all on sale with no stock tracked; give them
+# enough stock to keep selling until real counts are entered in the admin.
+INITIAL_STOCK = 100
+
+
+def create_variants(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Product = apps.get_model("core", "Product")
+    ProductVariant = apps.get_model("core", "ProductVariant")
+    colors, sizes = {}, {}
+    for product_id, color_id in Product.colors.through.objects.using(db).values_list("product_id", "color_id"):
+        colors.setdefault(product_id, []).append(color_id)
+    for product_id, size_id in Product.sizes.through.objects.using(db).values_list("product_id", "size_id"):
+        sizes.setdefault(product_id, []).append(size_id)
+    ProductVariant.objects.using(db).bulk_create(
+        (
+            ProductVariant(product_id=product_id, color_id=color_id, size_id=size_id, stock=INITIAL_STOCK)
+            for product_id, color_ids in colors.items()
+            for color_id in color_ids
+            for size_id in sizes.get(product_id, ())
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('color', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.color')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='core.product')),
+                ('size', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.size')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'size', 'color'), name='product_variant_unique')],
+            },
+        ),
+        migrations.RunPython(create_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:30
+
+from django.db import migrations, models
+
+
+def fill_summaries(apps, schema_editor):
+    # Same result as ProductQuerySet.refresh_summaries(), which historical models do not have.
+    db = schema_editor.connection.alias
+    Product = apps.get_model("core", "Product")
+    ProductImage = apps.get_model("core", "ProductImage")
+    products = {pk: Product(pk=pk) for pk in Product.objects.using(db).values_list("pk", flat=True)}
+    for product in products.values():
+        product.color_summary, product.size_summary = [], []
+    for product_id, *color in Product.colors.through.objects.using(db).order_by("product_id", "color_id").values_list(
+        "product_id", "color_id", "color__name", "color__hex"
+    ):
+        products[product_id].color_summary.append(dict(zip(("id", "name", "hex"), color)))
+    for product_id, size_id, value in Product.sizes.through.objects.using(db).order_by("product_id", "size_id").values_list(
+        "product_id", "size_id", "size__value"
+    ):
+        products[product_id].size_summary.append({"id": size_id, "value": value})
+    for product_id, image in ProductImage.objects.using(db).order_by("product_id", "order", "id").values_list(
+        "product_id", "image"
+    ):
+        product = products[product_id]
+        if not product.image_count:
+            product.primary_image = image
+        product.image_count += 1
+    Product.objects.using(db).bulk_update(
+        products.values(), ["color_summary", "size_summary", "image_count", "primary_image"], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_product_variant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='color_summary',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='primary_image',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='size_summary',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['image_count'], name='product_image_count_idx'),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+from core import search
+
+
+def drop_foreign_key(apps, schema_editor):
+    search.drop_foreign_key(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_image_derivative_widths'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_foreign_key, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,16 @@
+import operator
+from decimal import Decimal
+from functools import reduce
+
 from django.db import models
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
 from django.contrib.auth.models import User
 
 # --- Banner ---
 class Banner(models.Model):
     image = models.ImageField(upload_to="banners/")
+    image_widths = models.JSONField(default=list, blank=True, editable=False)  # derivatives, see core.images
     link = models.URLField(blank=True, null=True)  # optional
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -13,6 +20,7 @@ class TrendingItem(models.Model):
     sub_name = models.CharField(max_length=255, blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to="trending/")
+    image_widths = models.JSONField(default=list, blank=True, editable=False)  # derivatives, see core.images
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -41,9 +49,94 @@ class Size(models.Model):
     def __str__(self):
         return self.value
 
+class ProductQuerySet(models.QuerySet):
+    SUMMARY_FIELDS = ("color_summary", "size_summary", "image_count", "primary_image")
+    LIST_FIELDS = (
+        "id", "name", "sub_name", "price", "rating", "main_image", "main_image_widths", "category", "created_at",
+    ) + SUMMARY_FIELDS
+
+    def for_list(self):
+        """Only the columns ProductListSerializer reads: one table, no joins."""
+        return self.only(*self.LIST_FIELDS)
+
+    def for_detail(self):
+        return self.prefetch_related("images", "colors", "sizes")
+
+    def facet_counts(self):
+        """
+        Per-category, per-color and per-size product counts over this queryset,
+        as one UNION ALL query. Rows are dicts with facet, key, label, extra, count.
+        """
+        ids = self.order_by().values("pk")
+        text = models.CharField()
+        categories = (
+            self.model.objects.filter(pk__in=ids)
+            .values(facet=Value("category", output_field=text), key=F("category"),
+                    label=F("category"), extra=Value("", output_field=text))
+            .annotate(count=Count("id"))
+        )
+        colors = (
+            self.model.colors.through.objects.filter(product_id__in=ids)
+            .values(facet=Value("color", output_field=text), key=Cast("color_id", text),
+                    label=F("color__name"), extra=F("color__hex"))
+            .annotate(count=Count("product_id"))
+        )
+        sizes = (
+            self.model.sizes.through.objects.filter(product_id__in=ids)
+            .values(facet=Value("size", output_field=text), key=Cast("size_id", text),
+                    label=F("size__value"), extra=Value("", output_field=text))
+            .annotate(count=Count("product_id"))
+        )
+        return categories.union(colors, sizes, all=True)
+
+    def refresh_summaries(self, colors=True, sizes=True, images=True):
+        """
+        Recompute the denormalized color, size and/or image summary columns
+        of these products from the M2M and image tables.  Returns the new
+        values, ``{product_id: {field: value}}``.
+        """
+        ids = list(self.values_list("pk", flat=True))
+        if not ids:
+            return {}
+        summaries = {pk: {} for pk in ids}
+        if colors:
+            for pk in ids:
+                summaries[pk]["color_summary"] = []
+            for product_id, *color in self.model.colors.through.objects.filter(product_id__in=ids).order_by(
+                "product_id", "color_id"
+            ).values_list("product_id", "color_id", "color__name", "color__hex"):
+                summaries[product_id]["color_summary"].append(dict(zip(("id", "name", "hex"), color)))
+        if sizes:
+            for pk in ids:
+                summaries[pk]["size_summary"] = []
+            for product_id, size_id, value in self.model.sizes.through.objects.filter(product_id__in=ids).order_by(
+                "product_id", "size_id"
+            ).values_list("product_id", "size_id", "size__value"):
+                summaries[product_id]["size_summary"].append({"id": size_id, "value": value})
+        if images:
+            for pk in ids:
+                summaries[pk].update(image_count=0, primary_image="")
+            for product_id, image in ProductImage.objects.filter(product_id__in=ids).order_by(
+                "product_id", "order", "id"
+            ).values_list("product_id", "image"):
+                summary = summaries[product_id]
+                if not summary["image_count"]:
+                    summary["primary_image"] = image
+                summary["image_count"] += 1
+
+        fields = list(next(iter(summaries.values())))
+        if len(ids) == 1:
+            self.model.objects.filter(pk=ids[0]).update(**summaries[ids[0]])
+        else:
+            self.model.objects.bulk_update(
+                [self.model(pk=pk, **summary) for pk, summary in summaries.items()], fields, batch_size=500,
+            )
+        return summaries
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     main_image = models.ImageField(upload_to="products/", blank=True, null=True)
+    main_image_widths = models.JSONField(default=list, blank=True, editable=False)  # derivatives, see core.images
     sub_name = models.CharField(max_length=255, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True)
@@ -55,12 +148,43 @@ class Product(models.Model):
     sizes = models.ManyToManyField(Size, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Denormalized for listings, so a list row renders from this table alone. Kept up to date
+    # by core.signals; manage.py rebuild_product_summaries recomputes them.
+    color_summary = models.JSONField(default=list, blank=True, editable=False)  # [{"id", "name", "hex"}], by id
+    size_summary = models.JSONField(default=list, blank=True, editable=False)  # [{"id", "value"}], by id
+    image_count = models.PositiveIntegerField(default=0, editable=False)
+    primary_image = models.CharField(max_length=100, blank=True, editable=False)  # first gallery image
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "id"], name="product_created_id_idx"),
+            models.Index(fields=["category", "-created_at", "id"], name="product_cat_created_id_idx"),
+            # facet filters
+            models.Index(fields=["category", "price"], name="product_cat_price_idx"),
+            models.Index(fields=["price"], name="product_price_idx"),
+            models.Index(fields=["rating"], name="product_rating_idx"),
+            models.Index(fields=["image_count"], name="product_image_count_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # The summaries are only written by refresh_summaries(); saving an instance loaded
+        # before a color, size or image change must not put the old ones back.
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ProductQuerySet.SUMMARY_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name="images", on_delete=models.CASCADE)
     image = models.ImageField(upload_to="products/")
+    image_widths = models.JSONField(default=list, blank=True, editable=False)  # derivatives, see core.images
     order = models.PositiveIntegerField(default=0)
 
     class Meta:
@@ -69,15 +193,126 @@ class ProductImage(models.Model):
     def __str__(self):
         return f"{self.product.name} image #{self.order}"
 
+class ProductVariantQuerySet(models.QuerySet):
+    def sync(self, product_ids, stock=0):
+        """
+        Create the missing variants of the color x size offers of
+        ``product_ids`` (with ``stock``) and delete the ones no longer offered.
+        """
+        product_ids = set(product_ids)
+        colors, sizes = {}, {}
+        for product_id, color_id in Product.colors.through.objects.filter(product_id__in=product_ids).values_list(
+            "product_id", "color_id"
+        ):
+            colors.setdefault(product_id, []).append(color_id)
+        for product_id, size_id in Product.sizes.through.objects.filter(product_id__in=product_ids).values_list(
+            "product_id", "size_id"
+        ):
+            sizes.setdefault(product_id, []).append(size_id)
+        offered = {
+            (product_id, size_id, color_id)
+            for product_id, color_ids in colors.items()
+            for color_id in color_ids
+            for size_id in sizes.get(product_id, ())
+        }
+        existing = set(self.filter(product_id__in=product_ids).values_list("product_id", "size_id", "color_id"))
+        if offered - existing:
+            self.bulk_create(
+                [ProductVariant(product_id=p, size_id=s, color_id=c, stock=stock) for p, s, c in offered - existing],
+                ignore_conflicts=True,
+            )
+        if existing - offered:
+            self.filter(reduce(operator.or_, [Q(product_id=p, size_id=s, color_id=c) for p, s, c in existing - offered])).delete()
+
+    def reserve(self, quantities):
+        """
+        Take ``{(product_id, size_id, color_id): quantity}`` out of stock with a
+        single conditional UPDATE; every variant must exist and have enough
+        stock.  Returns whether it did.  A partial update (some variants short)
+        must be rolled back by the caller's transaction.
+        """
+        if not quantities:
+            return True
+        keys = [Q(product_id=p, size_id=s, color_id=c) for p, s, c in quantities]
+        wanted = Case(
+            *[When(key, then=Value(n)) for key, n in zip(keys, quantities.values())],
+            output_field=models.IntegerField(),
+        )
+        matching = reduce(operator.or_, keys)
+        updated = self.filter(matching, stock__gte=wanted).update(stock=F("stock") - wanted)
+        return updated == len(quantities)
+
+    def shortages(self, quantities):
+        """The keys of ``quantities`` that are unavailable, with the stock left (None: no such variant)."""
+        stock = {
+            (p, s, c): n for p, s, c, n in
+            self.filter(reduce(operator.or_, [Q(product_id=p, size_id=s, color_id=c) for p, s, c in quantities]))
+            .values_list("product_id", "size_id", "color_id", "stock")
+        }
+        return {key: stock.get(key) for key, n in quantities.items() if stock.get(key, 0) < n}
+
+
+class ProductVariant(models.Model):
+    """
+    One sellable color/size combination of a product and its stock.  Kept in
+    step with ``Product.colors`` x ``Product.sizes`` by ``core.signals``.
+    """
+    product = models.ForeignKey(Product, related_name="variants", on_delete=models.CASCADE)
+    color = models.ForeignKey(Color, on_delete=models.CASCADE)
+    size = models.ForeignKey(Size, on_delete=models.CASCADE)
+    stock = models.PositiveIntegerField(default=0)
+
+    objects = ProductVariantQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "size", "color"], name="product_variant_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} ({self.size}/{self.color})"
+
 # --- Cart models ---
+LINE_TOTAL = ExpressionWrapper(
+    F("quantity") * F("product__price"),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
+
+class CartQuerySet(models.QuerySet):
+    def with_total_price(self):
+        """Annotate ``total_price`` (sum of quantity * price over all items)."""
+        return self.annotate(
+            total_price=Coalesce(
+                Sum(F("items__quantity") * F("items__product__price"),
+                    output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Value(Decimal("0.00")),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="cart")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.user.username}'s Cart"
 
+class CartItemQuerySet(models.QuerySet):
+    def with_line_total(self):
+        return self.annotate(line_total=LINE_TOTAL)
+
+    def for_display(self):
+        """Everything CartItemSerializer touches, in a fixed number of queries."""
+        return (
+            self.select_related("product", "size", "color")
+            .prefetch_related("product__sizes", "product__colors")
+            .with_line_total()
+            .order_by("id")
+        )
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -86,6 +321,8 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ('cart', 'product', 'size', 'color')
 
@@ -94,8 +331,10 @@ class CartItem(models.Model):
 
 
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
-import uuid
+
+from .order_numbers import generate_order_number
 
 User = settings.AUTH_USER_MODEL
 
@@ -118,13 +357,21 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_created_idx"),
+            models.Index(fields=["user", "status", "-created_at"], name="order_user_status_created_idx"),
+            # TrackOrdersView only ever looks at orders that are still in flight.
+            models.Index(fields=["user", "-created_at", "-id"], condition=~Q(status="Delivered"),
+                         name="order_user_open_idx"),
+        ]
+
     def __str__(self):
         return f"{self.order_number} - {self.user}"
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            uid = uuid.uuid4().hex[:6].upper()
-            self.order_number = f"ORD-{uid}"
+            self.order_number = generate_order_number()
         super().save(*args, **kwargs)
 
 
@@ -141,3 +388,35 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product_name} x{self.quantity} ({self.order.order_number})"
+
+
+# --- Background jobs (see core/jobs.py) ---
+from django.utils import timezone
+
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="job_status_run_after_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
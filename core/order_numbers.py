@@ -0,0 +1,170 @@
+"""
+Order number generators.
+
+``Order.save`` calls :func:`generate_order_number`, which delegates to the
+callable named by ``settings.ORDER_NUMBER_GENERATOR``.  The default is a
+Snowflake-style scheme: a 41-bit millisecond timestamp, a 10-bit worker id
+and a 12-bit per-millisecond sequence, rendered as fixed-width base36.  The
+numbers are unique without a retry loop and increase monotonically within a
+worker, so new rows land at the right-hand edge of the ``order_number`` index.
+
+Uniqueness rests on no two live processes sharing a worker id.  Unless
+ORDER_NUMBER_WORKER_ID pins one, each process claims a free id from
+ORDER_NUMBER_WORKER_IDS by holding an advisory lock on a file per id in
+ORDER_NUMBER_LOCK_DIR; the OS drops the lock when the process exits, so ids
+of dead workers are reused without any clean-up.  The locks are per host:
+give each host its own ORDER_NUMBER_WORKER_IDS range when several write
+orders to the same database.
+"""
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_GENERATOR = "core.order_numbers.snowflake_order_number"
+PREFIX = "ORD-"
+
+EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+WIDTH = 13  # base36 digits needed for a 63-bit id
+
+BASE36 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def to_base36(value, width=WIDTH):
+    digits = []
+    while value:
+        value, rem = divmod(value, 36)
+        digits.append(BASE36[rem])
+    return "".join(reversed(digits)).rjust(width, "0")
+
+
+class SnowflakeGenerator:
+    def __init__(self, worker_id, epoch_ms=EPOCH_MS):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self.epoch_ms = epoch_ms
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now = time.time_ns() // 1_000_000 - self.epoch_ms
+            # Never step backwards, even if the wall clock does.
+            if now <= self._last_ms:
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond: borrow the next one.
+                    self._last_ms += 1
+                now = self._last_ms
+            else:
+                self._sequence = 0
+                self._last_ms = now
+            return (now << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+
+def _lock(path):
+    """An open descriptor holding an exclusive lock on ``path``, or None if another one holds it."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+_claims = {}  # worker id -> (pid, lock file descriptor)
+
+
+def claim_worker_id():
+    """A worker id from ORDER_NUMBER_WORKER_IDS that no other live process on this host holds."""
+    worker_ids = getattr(settings, "ORDER_NUMBER_WORKER_IDS", range(MAX_WORKER_ID + 1))
+    lock_dir = getattr(settings, "ORDER_NUMBER_LOCK_DIR", None) or os.path.join(
+        tempfile.gettempdir(), "order-number-workers"
+    )
+    os.makedirs(lock_dir, exist_ok=True)
+    start = os.getpid() % len(worker_ids)  # spread the first attempts
+    for offset in range(len(worker_ids)):
+        worker_id = worker_ids[(start + offset) % len(worker_ids)]
+        fd = _lock(os.path.join(lock_dir, f"{worker_id}.lock"))
+        if fd is not None:
+            _claims[worker_id] = (os.getpid(), fd)
+            return worker_id
+    raise ImproperlyConfigured(
+        f"Every order number worker id in {worker_ids} is held by another process on this host."
+    )
+
+
+def release_worker_id(worker_id):
+    pid, fd = _claims.pop(worker_id)
+    os.close(fd)
+
+
+def get_worker_id():
+    worker_id = getattr(settings, "ORDER_NUMBER_WORKER_ID", None)
+    if worker_id is None:
+        return claim_worker_id()
+    # Pinned: only safe when every process writing orders gets its own value.
+    return int(worker_id)
+
+
+_generator = None
+_generator_pid = None
+_generator_lock = threading.Lock()
+
+
+def get_snowflake_generator():
+    global _generator, _generator_pid
+    pid = os.getpid()
+    if _generator_pid != pid:
+        # Rebuilt after a fork so pre-forked workers don't share state or a worker id.
+        with _generator_lock:
+            if _generator_pid != pid:
+                for worker_id, (owner, fd) in list(_claims.items()):
+                    if owner != pid:
+                        # The parent's claim: closing our copy leaves its lock in place.
+                        del _claims[worker_id]
+                        os.close(fd)
+                _generator = SnowflakeGenerator(get_worker_id())
+                _generator_pid = pid
+    return _generator
+
+
+def snowflake_order_number():
+    return PREFIX + to_base36(get_snowflake_generator().next_id())
+
+
+def random_order_number():
+    """The original scheme: 6 random hex digits (~16.7M values)."""
+    return PREFIX + uuid.uuid4().hex[:6].upper()
+
+
+_resolved = {}
+
+
+def generate_order_number():
+    path = getattr(settings, "ORDER_NUMBER_GENERATOR", DEFAULT_GENERATOR)
+    generator = _resolved.get(path)
+    if generator is None:
+        generator = _resolved[path] = import_string(path)
+    return generator()
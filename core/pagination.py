@@ -0,0 +1,121 @@
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class AsyncCursorPaginationMixin:
+    """
+    ``apaginate_queryset`` for the views in ``core.async_views``: the cursor
+    handling of ``CursorPagination.paginate_queryset``, with the page fetched
+    through the async ORM instead of ``list(queryset[...])``.
+
+    ``paginate_list`` does the same over a list of objects that is already
+    sorted by ``ordering`` (the catalog snapshot, see ``core.catalog``).
+    """
+
+    def _start_page(self, request, queryset, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            return (0, False, None)
+        return self.cursor
+
+    def _position_lookup(self):
+        """``(attribute, "lt" or "gt")`` the current position filters on."""
+        order = self.ordering[0]
+        return order.lstrip("-"), "lt" if self.cursor.reverse != order.startswith("-") else "gt"
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        start = self._start_page(request, queryset, view)
+        if start is None:
+            return None
+        (offset, reverse, current_position) = start
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            order_attr, lookup = self._position_lookup()
+            queryset = queryset.filter(**{f"{order_attr}__{lookup}": current_position})
+
+        results = [obj async for obj in queryset[offset:offset + self.page_size + 1]]
+        return self._finish_page(results, offset, reverse, current_position)
+
+    def paginate_list(self, objects, request, view=None, to_python=str):
+        """
+        ``objects`` must be sorted by ``ordering``; ``to_python`` turns a
+        cursor position (a string) back into a value of the ordering field.
+        """
+        start = self._start_page(request, objects, view)
+        if start is None:
+            return None
+        (offset, reverse, current_position) = start
+
+        if reverse:
+            objects = objects[::-1]
+
+        if current_position is not None:
+            order_attr, lookup = self._position_lookup()
+            position = to_python(current_position)
+            if lookup == "lt":
+                objects = [obj for obj in objects if getattr(obj, order_attr) < position]
+            else:
+                objects = [obj for obj in objects if getattr(obj, order_attr) > position]
+
+        results = objects[offset:offset + self.page_size + 1]
+        return self._finish_page(results, offset, reverse, current_position)
+
+    def _finish_page(self, results, offset, reverse, current_position):
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+        return self.page
+
+
+class ProductCursorPagination(AsyncCursorPaginationMixin, CursorPagination):
+    """
+    Keyset pagination over (-created_at, id).
+
+    The cursor only ever filters on ``created_at`` (backed by the composite
+    index on Product), so the cost of a page does not grow with its depth.
+    """
+    ordering = ("-created_at", "id")
+    page_size = 24
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class OrderCursorPagination(AsyncCursorPaginationMixin, CursorPagination):
+    """Keyset pagination for a user's order history, newest first."""
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
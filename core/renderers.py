@@ -0,0 +1,71 @@
+"""
+JSON rendering.
+
+``FastJSONRenderer`` is DRF's ``JSONRenderer`` with the encoding done by
+orjson when it is installed: datetimes, dates, UUIDs and dicts are encoded
+natively in C and anything else (Decimal, lazy strings, querysets, ...)
+goes through DRF's ``JSONEncoder.default``, so the bytes are the same as
+the stdlib renderer's.  Pretty-printed output (``?format=json; indent=4``,
+the browsable API) and non-default UNICODE_JSON/COMPACT_JSON settings use
+the stdlib renderer.
+
+``stream_json_array`` writes a JSON array one element at a time, for
+exports too large to hold in memory as a single response body.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _escape_separators(content):
+    # Same as JSONRenderer: keep the output a strict JavaScript subset.
+    return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+def dumps(data):
+    """``data`` as compact UTF-8 JSON bytes, matching ``JSONRenderer().render(data)``."""
+    if orjson is not None:
+        try:
+            return _escape_separators(
+                orjson.dumps(data, default=_encoder.default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+            )
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers wider than 64 bits; let the stdlib encoder handle (or reject) them
+    return JSONRenderer().render(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+def stream_json_array(objects, to_representation, buffer_size=64 * 1024):
+    """
+    Yield a JSON array of ``to_representation(obj)`` for each of ``objects``
+    in pieces of about ``buffer_size`` bytes; pass a
+    ``.iterator(chunk_size=...)`` to keep memory flat.
+    """
+    buffer = bytearray(b"[")
+    separator = b""
+    for obj in objects:
+        buffer += separator
+        buffer += dumps(to_representation(obj))
+        separator = b","
+        if len(buffer) >= buffer_size:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b"]"
+    yield bytes(buffer)
@@ -0,0 +1,115 @@
+"""
+Primary/replica routing.
+
+Catalog reads (products, their images, colors and sizes, banners and
+trending items) go to the ``replica`` alias; everything else, and every
+write, goes to ``default``.  Enabled in settings when DATABASE_REPLICA_URL
+is set.
+
+A replica can lag behind the primary, so reads are pinned to the primary
+for the rest of the request once it has written anything, and for the
+whole of every non-GET request (checkout and cart writes read product
+prices and options that must be current).
+
+Whatever is stored under a catalog version (cached responses, the catalog
+snapshot) is filled with ``read_for_version``: the version is bumped as soon
+as the primary commits, and rows read from a replica that has not caught up
+would stay cached under it until the next write.  So for
+DATABASE_REPLICA_MAX_LAG seconds after a bump those fills read from the
+primary; after that the replica is assumed to have the change and takes
+them again.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .models import Banner, Color, Product, ProductImage, Size, TrendingItem
+
+PRIMARY = "default"
+REPLICA = "replica"
+
+CATALOG_MODELS = {
+    Product, ProductImage, Color, Size, Banner, TrendingItem,
+    Product.colors.through, Product.sizes.through,
+}
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_pinned = ContextVar("pin_primary", default=False)
+
+
+def pin_primary():
+    """Send every later read in this request (or thread of work) to the primary."""
+    _pinned.set(True)
+
+
+@contextmanager
+def read_from_primary():
+    """Send the reads inside the block to the primary."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+@contextmanager
+def read_for_version(version):
+    """
+    Send the reads inside the block to the primary while the change stamped
+    ``version`` (see ``core.cache``) may not have reached the replica yet.
+    """
+    max_lag = getattr(settings, "DATABASE_REPLICA_MAX_LAG", 5)
+    if time.time_ns() - version < max_lag * 1_000_000_000:
+        with read_from_primary():
+            yield
+    else:
+        yield
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model in CATALOG_MODELS and not _pinned.get():
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReadYourWritesMiddleware:
+    """Starts every request unpinned, except unsafe methods which start pinned."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _pinned.set(request.method not in SAFE_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+    async def __acall__(self, request):
+        token = _pinned.set(request.method not in SAFE_METHODS)
+        try:
+            return await self.get_response(request)
+        finally:
+            _pinned.reset(token)
@@ -0,0 +1,203 @@
+"""
+Full-text product search over name, sub_name and description.
+
+The index lives in a side table maintained from ``core.signals``:
+
+* PostgreSQL: ``core_product_search(product_id, document tsvector)`` with a
+  GIN index; name, sub_name and description are weighted A, B and C.
+* SQLite: an FTS5 virtual table ``core_product_fts`` keyed by product id and
+  ranked with bm25.
+
+Django does not know about either table, so neither references core_product
+(``flush`` truncates core_product on its own) and ``prune_index`` drops the
+rows of products that are gone after a flush.
+
+Any other backend falls back to ``icontains`` filtering.
+"""
+import operator
+import re
+from functools import reduce
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+PG_TABLE = "core_product_search"
+FTS_TABLE = "core_product_fts"
+NAME_WEIGHT, SUB_NAME_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 5.0, 1.0
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_backend(conn=None):
+    vendor = (conn or connection).vendor
+    if vendor in ("postgresql", "sqlite"):
+        return vendor
+    return None
+
+
+# --- schema (used by migration 0011) ---
+def create_index(schema_editor):
+    backend = search_backend(schema_editor.connection)
+    if backend == "postgresql":
+        schema_editor.execute(
+            f"CREATE TABLE {PG_TABLE} (product_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX {PG_TABLE}_document_gin ON {PG_TABLE} USING gin (document)")
+    elif backend == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "name, sub_name, description, tokenize='porter unicode61')"
+        )
+
+
+def drop_foreign_key(schema_editor):
+    # Tables created by migration 0011 before the index stopped referencing core_product.
+    if search_backend(schema_editor.connection) == "postgresql":
+        schema_editor.execute(f"ALTER TABLE {PG_TABLE} DROP CONSTRAINT IF EXISTS {PG_TABLE}_product_id_fkey")
+
+
+def drop_index(schema_editor):
+    backend = search_backend(schema_editor.connection)
+    if backend == "postgresql":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+    elif backend == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+# --- keeping the index in sync ---
+def _rows(products):
+    return [(p.pk, p.name or "", p.sub_name or "", p.description or "") for p in products]
+
+
+def index_products(products, conn=None):
+    """Insert or refresh the index rows of ``products``."""
+    conn = conn or connection
+    backend = search_backend(conn)
+    rows = _rows(products)
+    if not rows or backend is None:
+        return
+    with conn.cursor() as cursor:
+        if backend == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {PG_TABLE} (product_id, document) VALUES (%s,"
+                " setweight(to_tsvector('english', %s), 'A') ||"
+                " setweight(to_tsvector('english', %s), 'B') ||"
+                " setweight(to_tsvector('english', %s), 'C'))"
+                " ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+        else:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, sub_name, description) VALUES (%s, %s, %s, %s)", rows,
+            )
+
+
+def remove_products(product_ids, conn=None):
+    conn = conn or connection
+    backend = search_backend(conn)
+    if backend is None or not product_ids:
+        return
+    with conn.cursor() as cursor:
+        if backend == "postgresql":
+            cursor.execute(f"DELETE FROM {PG_TABLE} WHERE product_id = ANY(%s)", [list(product_ids)])
+        else:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+
+def prune_index(conn=None):
+    """Drop the index rows of products that no longer exist (e.g. after ``manage.py flush``)."""
+    conn = conn or connection
+    backend = search_backend(conn)
+    # Also runs after migrating to a state before migration 0011.
+    if backend is None or (PG_TABLE if backend == "postgresql" else FTS_TABLE) not in conn.introspection.table_names():
+        return
+    with conn.cursor() as cursor:
+        if backend == "postgresql":
+            cursor.execute(
+                f"DELETE FROM {PG_TABLE} WHERE NOT EXISTS"
+                f" (SELECT 1 FROM core_product WHERE core_product.id = {PG_TABLE}.product_id)"
+            )
+        else:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid NOT IN (SELECT id FROM core_product)")
+
+
+def rebuild_index(conn=None, batch_size=2000):
+    """Re-index every product, e.g. after ``bulk_create``."""
+    from .models import Product
+
+    conn = conn or connection
+    backend = search_backend(conn)
+    if backend is None:
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {PG_TABLE if backend == 'postgresql' else FTS_TABLE}")
+    products = Product.objects.only("id", "name", "sub_name", "description").order_by("id")
+    batch = []
+    for product in products.iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            index_products(batch, conn)
+            batch = []
+    index_products(batch, conn)
+
+
+# --- querying ---
+def _fts_match(tokens):
+    # Every term must match; the last one also as a prefix for search-as-you-type.
+    return (" ".join(f'"{token}"' for token in tokens[:-1]) + f' "{tokens[-1]}"*').strip()
+
+
+def _icontains(tokens):
+    return reduce(operator.and_, (
+        Q(name__icontains=token) | Q(sub_name__icontains=token) | Q(description__icontains=token)
+        for token in tokens
+    ))
+
+
+def search_product_ids(query, limit=24):
+    """Ids of the best matches for ``query``, best first."""
+    from .models import Product
+
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return []
+    backend = search_backend()
+    with connection.cursor() as cursor:
+        if backend == "postgresql":
+            cursor.execute(
+                f"SELECT product_id FROM {PG_TABLE}, websearch_to_tsquery('english', %s) query"
+                " WHERE document @@ query ORDER BY ts_rank(document, query) DESC, product_id DESC LIMIT %s",
+                [query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+        if backend == "sqlite":
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+                f" ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}, {SUB_NAME_WEIGHT}, {DESCRIPTION_WEIGHT}), rowid DESC"
+                " LIMIT %s",
+                [_fts_match(tokens), limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    qs = Product.objects.filter(_icontains(tokens))
+    return list(qs.order_by("-created_at").values_list("id", flat=True)[:limit])
+
+
+def search_filter(query):
+    """
+    A ``Q`` for every product matching ``query``, unranked and unlimited, for
+    filtering a queryset that is ordered and paginated elsewhere (the admin).
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return Q(pk__in=[])
+    backend = search_backend()
+    if backend == "postgresql":
+        return Q(pk__in=RawSQL(
+            f"SELECT product_id FROM {PG_TABLE} WHERE document @@ websearch_to_tsquery('english', %s)", [query],
+        ))
+    if backend == "sqlite":
+        return Q(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [_fts_match(tokens)]))
+    return _icontains(tokens)
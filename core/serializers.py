@@ -1,17 +1,35 @@
 from rest_framework import serializers
-from .models import Banner, TrendingItem, Product, ProductImage, Color, Size, Cart, CartItem
+from .models import Banner, TrendingItem, Product, ProductImage, ProductVariant, Color, Size, Cart, CartItem
+from .images import srcset
+from .metrics import TimedSerializerMixin
+
+class SrcsetField(serializers.SerializerMethodField):
+    """Responsive ``srcset`` strings per format for an image field, see core.images."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        return srcset(
+            getattr(obj, self.image_field), getattr(obj, f"{self.image_field}_widths"), self.context.get("request"),
+        )
 
 # --- Banner ---
-class BannerSerializer(serializers.ModelSerializer):
+class BannerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    srcset = SrcsetField("image")
+
     class Meta:
         model = Banner
-        fields = "__all__"
+        exclude = ("image_widths",)
 
 # --- TrendingItem ---
-class TrendingItemSerializer(serializers.ModelSerializer):
+class TrendingItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    srcset = SrcsetField("image")
+
     class Meta:
         model = TrendingItem
-        fields = "__all__"
+        exclude = ("image_widths",)
 
 # --- Product related ---
 class ColorSerializer(serializers.ModelSerializer):
@@ -25,14 +43,19 @@ class SizeSerializer(serializers.ModelSerializer):
         fields = ("id", "value")
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = SrcsetField("image")
+
     class Meta:
         model = ProductImage
-        fields = ("id", "image", "order")
+        fields = ("id", "image", "order", "srcset")
 
-class ProductListSerializer(serializers.ModelSerializer):
-    colors = ColorSerializer(many=True)
-    sizes = SizeSerializer(many=True)
+class ProductListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Renders from the product row alone: colors, sizes and images come from the summary columns."""
+    colors = serializers.JSONField(source="color_summary", read_only=True)
+    sizes = serializers.JSONField(source="size_summary", read_only=True)
     main_image_url = serializers.SerializerMethodField()
+    main_image_srcset = SrcsetField("main_image")
+    primary_image_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -43,9 +66,12 @@ class ProductListSerializer(serializers.ModelSerializer):
             "price",
             "rating",
             "main_image_url",
+            "main_image_srcset",
             "colors",
             "sizes",
             "category",
+            "image_count",
+            "primary_image_url",
         )
 
     def get_main_image_url(self, obj):
@@ -56,7 +82,14 @@ class ProductListSerializer(serializers.ModelSerializer):
             return obj.main_image.url
         return ""
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+    def get_primary_image_url(self, obj):
+        if not obj.primary_image:
+            return ""
+        url = ProductImage._meta.get_field("image").storage.url(obj.primary_image)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+class ProductDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True)
     colors = ColorSerializer(many=True)
     sizes = SizeSerializer(many=True)
@@ -66,7 +99,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "sub_name", "price", "rating", "description", "category", "images", "colors", "sizes", "secure_checkout_image", "size_help_image")
 
 # --- Cart serializers ---
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     product_name = serializers.CharField(source="product.name", read_only=True)
     sub_name = serializers.CharField(source="product.sub_name", read_only=True)
     price = serializers.DecimalField(source="product.price", max_digits=10, decimal_places=2, read_only=True)
@@ -75,10 +108,11 @@ class CartItemSerializer(serializers.ModelSerializer):
     color = ColorSerializer(read_only=True)
     available_sizes = SizeSerializer(source="product.sizes", many=True, read_only=True)
     available_colors = ColorSerializer(source="product.colors", many=True, read_only=True)
+    line_total = serializers.SerializerMethodField()
 
     class Meta:
         model = CartItem
-        fields = ("id", "product", "product_name", "sub_name", "price", "main_image_url", "size", "color", "available_sizes", "available_colors", "quantity")
+        fields = ("id", "product", "product_name", "sub_name", "price", "main_image_url", "size", "color", "available_sizes", "available_colors", "quantity", "line_total")
 
     def get_main_image_url(self, obj):
         if obj.product.main_image:
@@ -88,7 +122,14 @@ class CartItemSerializer(serializers.ModelSerializer):
             return obj.product.main_image.url
         return ""
 
-class CartSerializer(serializers.ModelSerializer):
+    def get_line_total(self, obj):
+        # annotated by CartItem.objects.with_line_total()
+        line_total = getattr(obj, "line_total", None)
+        if line_total is None:
+            line_total = obj.product.price * obj.quantity
+        return line_total
+
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.SerializerMethodField()
 
@@ -97,7 +138,11 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ("id", "user", "items", "total_price")
 
     def get_total_price(self, obj):
-        return sum([item.product.price * item.quantity for item in obj.items.all()])
+        # annotated by Cart.objects.with_total_price()
+        total_price = getattr(obj, "total_price", None)
+        if total_price is None:
+            total_price = Cart.objects.with_total_price().values_list("total_price", flat=True).get(pk=obj.pk)
+        return total_price
 
 
 
@@ -118,36 +163,153 @@ class OrderItemSerializer(serializers.ModelSerializer):
             "color",
         ]
 
-class OrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True)
+class OrderListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Order history rows; leaves out the shipping address."""
+    items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
-        fields = [
-            "id",
-            "order_number",
-            "user",
-            "total_price",
-            "shipping_address",
-            "payment_status",
-            "status",
-            "created_at",
-            "items",
+        fields = ["id", "order_number", "total_price", "payment_status", "status", "created_at", "items"]
+
+
+class OrderExportSerializer(OrderListSerializer):
+    """Everything about an order, for the admin JSON export."""
+
+    class Meta(OrderListSerializer.Meta):
+        fields = OrderListSerializer.Meta.fields + ["user", "shipping_address", "updated_at"]
+
+
+# --- Checkout ---
+from django.db import transaction
+
+
+class CheckoutItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    size_id = serializers.IntegerField()
+    color_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class OutOfStock(Exception):
+    """
+    Raised inside the order transaction; ``load_items`` lists the short
+    variants once it is rolled back (before that, the stock read would
+    include the partial reservation).
+    """
+    def __init__(self, quantities, names):
+        super().__init__("Not enough stock")
+        self.quantities = quantities
+        self.names = names
+        self.items = []
+
+    def load_items(self):
+        self.items = [
+            {"product_id": key[0], "product_name": self.names[key][0], "size": self.names[key][1],
+             "color": self.names[key][2], "requested": self.quantities[key], "available": available or 0}
+            for key, available in ProductVariant.objects.shortages(self.quantities).items()
         ]
-        read_only_fields = ["id", "order_number", "user", "created_at", "status", "payment_status"]
 
-    def create(self, validated_data):
-        items_data = validated_data.pop("items", [])
+
+def reserve_stock(lines):
+    """
+    Take the quantities of ``(product, size, color, quantity)`` lines out of
+    stock in one conditional UPDATE, or raise OutOfStock; must run inside
+    the order's transaction.
+    """
+    quantities = {}
+    for product, size, color, quantity in lines:
+        key = (product.pk, size.pk, color.pk)
+        quantities[key] = quantities.get(key, 0) + quantity
+    if not ProductVariant.objects.reserve(quantities):
+        names = {(product.pk, size.pk, color.pk): (product.name, size.value, color.name)
+                 for product, size, color, _ in lines}
+        raise OutOfStock(quantities, names)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """
+    Builds an order from the user's cart, or from ``items`` when given.
+
+    Client-side prices and names are never trusted: every line is re-priced
+    from Product, the total is recomputed, and the stock reservation, the
+    order, its items and the cart clean-up are written in one transaction.
+    """
+    shipping_address = serializers.JSONField()
+    items = CheckoutItemSerializer(many=True, required=False)
+
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("At least one item is required.")
+        product_ids = {item["product_id"] for item in items}
+        products = Product.objects.in_bulk(product_ids)
+        variants = {
+            (variant.product_id, variant.size_id, variant.color_id): variant
+            for variant in ProductVariant.objects.filter(product_id__in=product_ids).select_related("size", "color")
+        }
+
+        lines = []
+        for item in items:
+            product = products.get(item["product_id"])
+            if product is None:
+                raise serializers.ValidationError(f"Product {item['product_id']} does not exist.")
+            variant = variants.get((product.pk, item["size_id"], item["color_id"]))
+            if variant is None:
+                raise serializers.ValidationError(f"Size or color is not available for {product.name}.")
+            lines.append((product, variant.size, variant.color, item["quantity"]))
+        return lines
+
+    def _image_url(self, product):
+        if not product.main_image:
+            return ""
         request = self.context.get("request")
-        user = request.user if request else None
+        if request:
+            return request.build_absolute_uri(product.main_image.url)
+        return product.main_image.url
 
-        # Default empty dict if missing
-        shipping_address = validated_data.pop("shipping_address", {})
+    def create(self, validated_data):
+        user = self.context["request"].user
+        try:
+            order = self._create(user, validated_data)
+        except OutOfStock as exc:
+            exc.load_items()
+            raise
+        return order
 
-        order = Order.objects.create(user=user, shipping_address=shipping_address, **validated_data)
+    def _create(self, user, validated_data):
+        with transaction.atomic():
+            lines = validated_data.get("items")
+            cart_item_ids = []
+            if lines is None:
+                cart_items = list(
+                    CartItem.objects.select_for_update(of=("self",))
+                    .filter(cart__user=user)
+                    .select_related("product", "size", "color")
+                    .order_by("id")
+                )
+                if not cart_items:
+                    raise serializers.ValidationError({"items": "Cart is empty."})
+                lines = [(ci.product, ci.size, ci.color, ci.quantity) for ci in cart_items]
+                cart_item_ids = [ci.pk for ci in cart_items]
 
-        order_items = []
-        for item in items_data:
-            order_items.append(OrderItem(order=order, **item))
-        OrderItem.objects.bulk_create(order_items)
+            reserve_stock(lines)
+            total_price = sum(product.price * quantity for product, size, color, quantity in lines)
+            order = Order.objects.create(
+                user=user, total_price=total_price, shipping_address=validated_data["shipping_address"],
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product_id=product.pk,
+                    product_name=product.name,
+                    sub_name=product.sub_name,
+                    main_image_url=self._image_url(product),
+                    unit_price=product.price,
+                    quantity=quantity,
+                    size=size.value,
+                    color=color.name,
+                )
+                for product, size, color, quantity in lines
+            ])
+            if cart_item_ids:
+                CartItem.objects.filter(pk__in=cart_item_ids).delete()
         return order
@@ -0,0 +1,169 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import images, metrics, search
+from .cache import bump_version
+from .models import Banner, Color, Product, ProductImage, ProductVariant, Size, TrendingItem
+
+# Models whose changes show up in each cached catalog group.
+CACHE_GROUPS = {
+    Product: "products",
+    ProductImage: "products",
+    Color: "products",
+    Size: "products",
+    Banner: "banners",
+    TrendingItem: "trending",
+}
+
+
+def invalidate_group(group):
+    # Bump once the write is visible to other connections, otherwise a
+    # concurrent reader could cache the old rows under the new version.
+    transaction.on_commit(partial(bump_version, group))
+
+
+def invalidate_catalog_cache(sender, **kwargs):
+    invalidate_group(CACHE_GROUPS[sender])
+
+
+# Connected per sender: a sender-less post_delete receiver would disable
+# Django's fast-path deletes for every model.
+for model in CACHE_GROUPS:
+    post_save.connect(invalidate_catalog_cache, sender=model, dispatch_uid=f"catalog-cache-save-{model.__name__}")
+    post_delete.connect(invalidate_catalog_cache, sender=model, dispatch_uid=f"catalog-cache-delete-{model.__name__}")
+
+
+@receiver(m2m_changed, sender=Product.colors.through)
+@receiver(m2m_changed, sender=Product.sizes.through)
+def invalidate_product_relations(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_group("products")
+
+
+# --- Variants ---
+@receiver(m2m_changed, sender=Product.colors.through, dispatch_uid="variants-colors")
+@receiver(m2m_changed, sender=Product.sizes.through, dispatch_uid="variants-sizes")
+def sync_product_variants(sender, instance, action, reverse, pk_set, **kwargs):
+    """New color/size combinations get a variant (VARIANT_DEFAULT_STOCK), dropped ones lose theirs."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        product_ids = [instance.pk]
+    elif pk_set is not None:
+        product_ids = pk_set
+    else:
+        # A color or size was cleared from all its products: those that still have variants of it.
+        option = "color" if sender is Product.colors.through else "size"
+        product_ids = ProductVariant.objects.filter(**{option: instance}).values_list("product_id", flat=True)
+    ProductVariant.objects.sync(product_ids, stock=getattr(settings, "VARIANT_DEFAULT_STOCK", 0))
+
+
+# --- Listing summaries (Product.color_summary, size_summary, image_count, primary_image) ---
+@receiver(m2m_changed, sender=Product.colors.through, dispatch_uid="summaries-colors")
+@receiver(m2m_changed, sender=Product.sizes.through, dispatch_uid="summaries-sizes")
+def refresh_option_summaries(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        # Afterwards there is no telling which products offered this color or size.
+        instance._summary_product_ids = list(instance.product_set.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    colors = sender is Product.colors.through
+    if not reverse:
+        summaries = Product.objects.filter(pk=instance.pk).refresh_summaries(colors=colors, sizes=not colors, images=False)
+        # Keep the caller's instance current too.
+        for field, value in summaries.get(instance.pk, {}).items():
+            setattr(instance, field, value)
+    else:
+        product_ids = pk_set if pk_set is not None else instance.__dict__.pop("_summary_product_ids", [])
+        Product.objects.filter(pk__in=product_ids).refresh_summaries(colors=colors, sizes=not colors, images=False)
+
+
+@receiver(post_save, sender=Color, dispatch_uid="summaries-color-save")
+@receiver(post_save, sender=Size, dispatch_uid="summaries-size-save")
+def refresh_renamed_option(sender, instance, created, **kwargs):
+    if not created:
+        instance.product_set.all().refresh_summaries(colors=sender is Color, sizes=sender is Size, images=False)
+
+
+@receiver(pre_delete, sender=Color, dispatch_uid="summaries-color-pre-delete")
+@receiver(pre_delete, sender=Size, dispatch_uid="summaries-size-pre-delete")
+def remember_option_products(sender, instance, **kwargs):
+    # The M2M rows are deleted along with the color or size, without m2m_changed.
+    instance._summary_product_ids = list(instance.product_set.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Color, dispatch_uid="summaries-color-delete")
+@receiver(post_delete, sender=Size, dispatch_uid="summaries-size-delete")
+def refresh_deleted_option(sender, instance, **kwargs):
+    Product.objects.filter(pk__in=instance.__dict__.pop("_summary_product_ids", [])).refresh_summaries(
+        colors=sender is Color, sizes=sender is Size, images=False,
+    )
+
+
+@receiver(post_save, sender=ProductImage, dispatch_uid="summaries-image-save")
+@receiver(post_delete, sender=ProductImage, dispatch_uid="summaries-image-delete")
+def refresh_image_summary(sender, instance, **kwargs):
+    Product.objects.filter(pk=instance.product_id).refresh_summaries(colors=False, sizes=False)
+
+
+# --- Full-text search index ---
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_migrate, dispatch_uid="search-prune")
+def prune_search_index(sender, app_config, using, **kwargs):
+    # manage.py flush (also between TransactionTestCases) sends post_migrate after emptying core_product.
+    if app_config.label == "core":
+        search.prune_index(connections[using])
+
+
+# --- Responsive image derivatives ---
+IMAGE_FIELDS = {
+    Product: "main_image",
+    ProductImage: "image",
+    Banner: "image",
+    TrendingItem: "image",
+}
+
+
+def record_image_widths(model, name, widths):
+    """Store the derivative widths of ``name`` on the rows that still show it."""
+    field = IMAGE_FIELDS[model]
+    rows = model.objects.filter(**{field: name}).exclude(**{f"{field}_widths": widths})
+    if rows.update(**{f"{field}_widths": widths}):
+        invalidate_catalog_cache(model)
+
+
+def forget_image_widths(sender, instance, **kwargs):
+    # A new upload has no derivatives yet; the widths are recorded once they are generated.
+    field = IMAGE_FIELDS[sender]
+    if not getattr(instance, field)._committed:
+        setattr(instance, f"{field}_widths", [])
+
+
+def schedule_image_derivatives(sender, instance, **kwargs):
+    images.schedule_derivatives(getattr(instance, IMAGE_FIELDS[sender]).name, partial(record_image_widths, sender))
+
+
+for model in IMAGE_FIELDS:
+    pre_save.connect(forget_image_widths, sender=model, dispatch_uid=f"image-widths-{model.__name__}")
+    post_save.connect(schedule_image_derivatives, sender=model, dispatch_uid=f"image-derivatives-{model.__name__}")
+
+
+# --- Request metrics ---
+# Every new connection (also the ones sync_to_async threads open for async
+# views) counts its queries towards the current request.
+connection_created.connect(metrics.install_query_recorder, dispatch_uid="metrics-query-recorder")
@@ -0,0 +1,53 @@
+"""
+Static files in front of the Django application, outside its middleware chain.
+
+WhiteNoiseMiddleware is sync-only: under ASGI Django would adapt it, and with
+it every request (the async API views included), to a thread.  So MIDDLEWARE
+leaves it out and backend/asgi.py and backend/wsgi.py wrap the application
+instead.  Both wrappers take their configuration from the same settings as
+WhiteNoiseMiddleware (STATIC_ROOT, STATIC_URL, WHITENOISE_*); under ASGI only
+requests for a static file go through a thread.
+"""
+from functools import partial
+
+from asgiref.wsgi import WsgiToAsgi
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.string_utils import decode_path_info
+
+
+class StaticFiles:
+    def __init__(self, application):
+        self.application = application
+        self.whitenoise = WhiteNoiseMiddleware()
+
+    def find(self, path_info):
+        whitenoise = self.whitenoise
+        if not path_info.startswith(whitenoise.static_prefix):
+            return None
+        return whitenoise.find_file(path_info) if whitenoise.autorefresh else whitenoise.files.get(path_info)
+
+
+class StaticFilesWSGI(StaticFiles):
+    """WSGI: static files from WhiteNoise, everything else to ``application``."""
+
+    def __call__(self, environ, start_response):
+        static_file = self.find(decode_path_info(environ.get("PATH_INFO", "")))
+        if static_file is None:
+            return self.application(environ, start_response)
+        return WhiteNoise.serve(static_file, environ, start_response)
+
+
+class StaticFilesASGI(StaticFiles):
+    """ASGI: static files from WhiteNoise (on a thread), everything else to ``application``."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path_info = scope["path"]
+            root_path = scope.get("root_path", "")
+            if root_path and path_info.startswith(root_path):
+                path_info = path_info[len(root_path):]
+            static_file = self.find(path_info)
+            if static_file is not None:
+                return await WsgiToAsgi(partial(WhiteNoise.serve, static_file))(scope, receive, send)
+        return await self.application(scope, receive, send)
@@ -1,3 +1,1708 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import closing
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.core.files.base import ContentFile
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from PIL import Image
+
+from backend.settings import database_config
+
+from . import catalog, images, search
+from .cache import CachedCatalogMixin, get_version
+from .checks import check_catalog_snapshot, check_shared_cache
+from .jobs import enqueue, run_pending
+from .fast_serializers import (
+    BANNER_FIELDS, PRODUCT_LIST_FIELDS, TRENDING_FIELDS,
+    serialize_banners, serialize_product_list, serialize_trending,
+)
+from .models import Banner, Job, Product, ProductImage, ProductQuerySet, ProductVariant, Color, Size, Cart, CartItem, Order, OrderItem, TrendingItem
+from .images import derivative_name, generate_derivatives
+from .metrics import REGISTRY
+from .serializers import BannerSerializer, ProductListSerializer, TrendingItemSerializer
+from .renderers import FastJSONRenderer, stream_json_array
+from .routers import PrimaryReplicaRouter, ReadYourWritesMiddleware
+from .search import search_filter
+from .static_files import StaticFilesASGI
+from .order_numbers import SnowflakeGenerator, claim_worker_id, release_worker_id, snowflake_order_number
+from .pagination import ProductCursorPagination
+from .views import add_to_cart, cart_changed, cart_count_cache_key
+
+
+def make_catalog(count, category="men", stock=100):
+    red = Color.objects.create(name="Red", hex="#ff0000")
+    blue = Color.objects.create(name="Blue", hex="#0000ff")
+    small = Size.objects.create(value="S")
+    large = Size.objects.create(value="L")
+    products = []
+    for i in range(count):
+        product = Product.objects.create(
+            name=f"Shoe {i}", sub_name="Runner", price=Decimal("100.00") + i,
+            description="Lightweight running shoe", category=category,
+        )
+        product.colors.set([red, blue])
+        product.sizes.set([small, large])
+        ProductImage.objects.create(product=product, image=f"products/shoe_{i}.png", order=0)
+        products.append(product)
+    ProductVariant.objects.filter(product__in=products).update(stock=stock)
+    return products
+
+
+# --- Products ---
+@override_settings(CATALOG_SNAPSHOT=False)
+class ProductQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def assertListQueries(self, count):
+        make_catalog(count)
+        # products only: colors, sizes and images come from the summary columns
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_query_count_small_catalog(self):
+        self.assertListQueries(2)
+
+    def test_list_query_count_large_catalog(self):
+        self.assertListQueries(48)
+
+    def test_detail_query_count(self):
+        product = make_catalog(3)[0]
+        # product + images + colors + sizes
+        with self.assertNumQueries(4):
+            response = self.client.get(f"/api/products/{product.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["images"]), 1)
+        self.assertEqual(len(response.data["colors"]), 2)
+
+
+@override_settings(CATALOG_SNAPSHOT=True)
+class CatalogSnapshotTests(TestCase):
+    """The snapshot endpoints must answer exactly like the SQL ones."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.products = make_catalog(6) + make_catalog(4, category="women")
+        product = self.products[0]
+        product.main_image = "products/main.png"
+        product.secure_checkout_image = "secure_images/s.png"
+        product.save()
+        Product.objects.filter(pk=product.pk).update(main_image_widths=[320, 640])
+        ProductImage.objects.create(product=product, image="products/second.png", order=1, image_widths=[320])
+        self.products[1].colors.clear()
+        Product.objects.create(name="Bare", price=Decimal("5.50"), rating=Decimal("4.50"), category="kids")
+
+    def assertSameResponse(self, url):
+        response = self.client.get(url)
+        cache.clear()
+        with override_settings(CATALOG_SNAPSHOT=False):
+            reference = self.client.get(url)
+        cache.clear()
+        self.assertEqual(response.status_code, reference.status_code, url)
+        self.assertEqual(response.content, reference.content, url)
+        return response
+
+    def test_list_and_filters_match_sql(self):
+        red = self.products[0].colors.get(name="Red")
+        small = self.products[6].sizes.get(value="S")
+        for query in (
+            "", "category=women", "category=kids&min_rating=4", "min_price=102&max_price=104.5",
+            f"color={red.pk}", f"color={red.pk},999&size={small.pk}", "category=nope", "min_price=abc", "color=x",
+        ):
+            self.assertSameResponse(f"/api/products/?{query}")
+
+    def test_pagination_matches_sql(self):
+        url = "/api/products/?page_size=4&category=men"
+        while url:
+            data = self.assertSameResponse(url).json()
+            url = data["next"]
+        self.assertSameResponse(data["previous"])
+
+    def test_detail_matches_sql(self):
+        for pk in (self.products[0].pk, self.products[1].pk, 999999, "abc"):
+            self.assertSameResponse(f"/api/products/{pk}/")
+
+    def test_served_without_queries(self):
+        self.client.get("/api/products/")
+        with self.assertNumQueries(0):
+            self.client.get("/api/products/?category=women&page_size=2")
+            self.client.get(f"/api/products/{self.products[2].pk}/")
+
+    def test_rebuilt_when_the_catalog_changes(self):
+        snapshot = catalog.get_snapshot()
+        self.assertIs(catalog.get_snapshot(), snapshot)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.products[0].pk).update(name="Renamed")
+            self.products[0].colors.clear()
+        rebuilt = catalog.get_snapshot()
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertEqual(rebuilt.get(self.products[0].pk).name, "Renamed")
+        self.assertEqual(rebuilt.get(self.products[0].pk).colors, ())
+        # the old snapshot is untouched
+        self.assertEqual(snapshot.get(self.products[0].pk).name, "Shoe 0")
+
+    def test_options_are_shared(self):
+        snapshot = catalog.get_snapshot()
+        first, second = snapshot.get(self.products[2].pk), snapshot.get(self.products[3].pk)
+        self.assertIs(first.colors, second.colors)
+        self.assertIs(first.price.__class__, Decimal)
+        self.assertEqual(snapshot.by_category["women"], {p.pk for p in self.products[6:]})
+
+    def test_stats_command(self):
+        out = StringIO()
+        call_command("catalog_snapshot", stdout=out)
+        stats = json.loads(out.getvalue())
+        self.assertEqual(stats["products"], 11)
+        self.assertGreater(stats["memory_bytes"], 0)
+        self.assertGreater(stats["memory_bytes_per_10k"], stats["memory_bytes"])
+
+
+class ProductSummaryTests(TestCase):
+    """The denormalized listing columns follow every change of colors, sizes and images."""
+
+    def setUp(self):
+        self.product = make_catalog(1)[0]
+        self.red, self.blue = Color.objects.order_by("id")
+        self.small, self.large = Size.objects.order_by("id")
+
+    def summary(self, product=None):
+        return Product.objects.values(*ProductQuerySet.SUMMARY_FIELDS).get(pk=(product or self.product).pk)
+
+    def expected(self, product=None):
+        product = product or self.product
+        images = list(product.images.order_by("order", "id"))
+        return {
+            "color_summary": [{"id": c.pk, "name": c.name, "hex": c.hex} for c in product.colors.order_by("id")],
+            "size_summary": [{"id": s.pk, "value": s.value} for s in product.sizes.order_by("id")],
+            "image_count": len(images),
+            "primary_image": images[0].image.name if images else "",
+        }
+
+    def test_filled_on_create(self):
+        self.assertEqual(self.summary(), self.expected())
+        self.assertEqual(self.summary()["image_count"], 1)
+        # the instance the options were set on is current too
+        self.assertEqual(self.product.size_summary, [{"id": self.small.pk, "value": "S"}, {"id": self.large.pk, "value": "L"}])
+
+    def test_follows_option_changes(self):
+        other = make_catalog(1)[0]
+        self.product.colors.remove(self.red)
+        self.assertEqual(self.summary(), self.expected())
+        self.red.product_set.add(self.product)  # reverse side
+        self.assertEqual(self.summary(), self.expected())
+        self.blue.name = "Navy"
+        self.blue.save()
+        self.assertEqual(self.summary()["color_summary"][1]["name"], "Navy")
+        self.small.product_set.clear()
+        self.assertEqual(self.summary()["size_summary"], [{"id": self.large.pk, "value": "L"}])
+        self.large.delete()
+        self.assertEqual(self.summary()["size_summary"], [])
+        self.assertEqual(self.summary(other), self.expected(other))
+
+    def test_follows_image_changes(self):
+        self.product.images.update(order=2)
+        first = ProductImage.objects.create(product=self.product, image="products/first.png", order=1)
+        self.assertEqual(self.summary(), self.expected())
+        self.assertEqual(self.summary()["primary_image"], "products/first.png")
+        first.delete()
+        self.product.images.all().delete()
+        self.assertEqual((self.summary()["image_count"], self.summary()["primary_image"]), (0, ""))
+
+    def test_saving_a_stale_instance_keeps_the_summaries(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        self.product.colors.clear()
+        stale.name = "Renamed"
+        stale.save()
+        self.assertEqual(self.summary()["color_summary"], [])
+
+    def test_rebuild_command(self):
+        Product.objects.update(color_summary=[], image_count=7)
+        out = StringIO()
+        call_command("rebuild_product_summaries", batch_size=1, stdout=out)
+        self.assertIn("1 were out of date", out.getvalue())
+        self.assertEqual(self.summary(), self.expected())
+
+    def test_listed_from_the_summaries(self):
+        cache.clear()
+        item = APIClient().get("/api/products/").json()["results"][0]
+        self.assertEqual(item["image_count"], 1)
+        self.assertEqual(item["primary_image_url"], "http://testserver/media/products/shoe_0.png")
+        self.assertEqual([color["name"] for color in item["colors"]], ["Red", "Blue"])
+
+
+class ProductPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.products = make_catalog(12)
+
+    def walk(self, queries):
+        seen = []
+        url = "/api/products/?page_size=5"
+        while url:
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        expected = [p.pk for p in sorted(self.products, key=lambda p: (p.created_at, -p.pk), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    @override_settings(CATALOG_SNAPSHOT=False)
+    def test_cursor_walks_whole_catalog_once(self):
+        self.walk(queries=1)
+
+    @override_settings(CATALOG_SNAPSHOT=True)
+    def test_cursor_walks_catalog_snapshot(self):
+        catalog.get_snapshot()
+        self.walk(queries=0)
+
+    def test_cursor_is_opaque(self):
+        response = self.client.get("/api/products/?page_size=5")
+        self.assertIn("cursor=", response.data["next"])
+        self.assertNotIn("created_at", response.data["next"])
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(ProductCursorPagination.max_page_size, 100)
+        with mock.patch.object(ProductCursorPagination, "max_page_size", 5):
+            response = self.client.get("/api/products/?page_size=1000")
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertIsNotNone(response.data["next"])
+
+
+@override_settings(IMAGE_DERIVATIVES_ENABLED=False)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.products = make_catalog(3)
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get("/api/products/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/products/")
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_key_varies_by_query_params(self):
+        Product.objects.create(name="Kid shoe", price=10, category="kids")
+        self.assertEqual(len(self.client.get("/api/products/?category=men").data["results"]), 3)
+        self.assertEqual(len(self.client.get("/api/products/?category=kids").data["results"]), 1)
+
+    def test_conditional_get_returns_304(self):
+        etag = self.client.get("/api/products/")["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        last_modified = self.client.get("/api/products/")["Last-Modified"]
+        response = self.client.get("/api/products/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_changes_validators(self):
+        first = self.client.get("/api/products/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="New shoe", price=10, category="men")
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertNotEqual(response["Last-Modified"], first["Last-Modified"])
+
+    def test_detail_conditional_get(self):
+        url = f"/api/products/{self.products[0].pk}/"
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_invalidate(self):
+        self.client.get("/api/products/")
+        product = self.products[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Renamed"
+            product.save()
+        names = [p["name"] for p in self.client.get("/api/products/").data["results"]]
+        self.assertIn("Renamed", names)
+
+        detail = self.client.get(f"/api/products/{product.pk}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.create(product=product, image="products/extra.png", order=1)
+        self.assertEqual(len(self.client.get(f"/api/products/{product.pk}/").data["images"]),
+                         len(detail.data["images"]) + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.colors.clear()
+        self.assertEqual(self.client.get(f"/api/products/{product.pk}/").data["colors"], [])
+
+    def test_banner_invalidation(self):
+        self.assertEqual(self.client.get("/api/banners/").data, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Banner.objects.create(image="banners/b1.png")
+        self.assertEqual(len(self.client.get("/api/banners/").data), 1)
+
+    def test_versions_expire_on_a_process_local_cache(self):
+        # Other processes never see a bump on locmem; the expiry bounds how long they lag.
+        version = get_version("products")
+        later = time.time() + settings.CATALOG_VERSION_TIMEOUT + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=later):
+            self.assertNotEqual(get_version("products"), version)
+
+    def test_deploy_check_flags_a_process_local_cache(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ["core.W001"])
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_catalog_snapshot_needs_a_shared_cache(self):
+        self.assertEqual(check_catalog_snapshot(None), [])
+        with override_settings(CATALOG_SNAPSHOT=True):
+            self.assertEqual([error.id for error in check_catalog_snapshot(None)], ["core.E001"])
+            with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+                self.assertEqual(check_catalog_snapshot(None), [])
+
+
+class ProductFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.red = Color.objects.create(name="Red", hex="#ff0000")
+        self.blue = Color.objects.create(name="Blue", hex="#0000ff")
+        self.small = Size.objects.create(value="S")
+        self.large = Size.objects.create(value="L")
+        self.cheap = Product.objects.create(name="Cheap", price=100, rating=3, category="men")
+        self.cheap.colors.set([self.red, self.blue])
+        self.cheap.sizes.set([self.small])
+        self.mid = Product.objects.create(name="Mid", price=500, rating=4, category="men")
+        self.mid.colors.set([self.red])
+        self.mid.sizes.set([self.small, self.large])
+        self.dear = Product.objects.create(name="Dear", price=900, rating=5, category="women")
+        self.dear.colors.set([self.blue])
+        self.dear.sizes.set([self.large])
+
+    def names(self, **params):
+        response = self.client.get("/api/products/", params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(p["name"] for p in response.data["results"])
+
+    def test_price_and_rating(self):
+        self.assertEqual(self.names(min_price=200, max_price=900), ["Dear", "Mid"])
+        self.assertEqual(self.names(min_rating=4), ["Dear", "Mid"])
+
+    def test_colors_and_sizes(self):
+        self.assertEqual(self.names(color=f"{self.red.pk},{self.blue.pk}"), ["Cheap", "Dear", "Mid"])
+        self.assertEqual(self.names(color=self.red.pk, size=self.large.pk), ["Mid"])
+
+    def test_category_still_filters(self):
+        self.assertEqual(self.names(category="women"), ["Dear"])
+
+    def test_facet_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/products/facets/", {"category": "men"})
+        self.assertEqual(response.data["categories"], [{"value": "men", "count": 2}])
+        self.assertEqual(response.data["colors"], [
+            {"id": self.red.pk, "name": "Red", "hex": "#ff0000", "count": 2},
+            {"id": self.blue.pk, "name": "Blue", "hex": "#0000ff", "count": 1},
+        ])
+        self.assertEqual({s["value"]: s["count"] for s in response.data["sizes"]}, {"S": 2, "L": 1})
+        with self.assertNumQueries(0):
+            self.client.get("/api/products/facets/", {"category": "men"})
+
+    def test_invalid_filter_value(self):
+        self.assertEqual(self.client.get("/api/products/", {"min_price": "cheap"}).status_code, 400)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.trail = Product.objects.create(name="Trail Runner", price=120, category="men",
+                                            description="Grippy sole for muddy paths")
+        self.sandal = Product.objects.create(name="Beach Sandal", sub_name="Summer", price=40, category="women",
+                                             description="Pairs with a trail of sand")
+        Product.objects.create(name="School Shoe", price=60, category="kids", description="Black leather")
+
+    def search(self, query):
+        return [p["name"] for p in self.client.get("/api/products/search/", {"q": query}).data["results"]]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search("trail"), ["Trail Runner", "Beach Sandal"])
+
+    def test_all_terms_must_match_and_last_is_prefix(self):
+        self.assertEqual(self.search("beach sand"), ["Beach Sandal"])
+        self.assertEqual(self.search("scho"), ["School Shoe"])
+
+    def test_stemming(self):
+        self.assertEqual(self.search("runners"), ["Trail Runner"])
+
+    def test_search_filter_for_the_admin(self):
+        # Unlimited: the admin paginates through every match.
+        matches = Product.objects.filter(search_filter("trail"))
+        self.assertEqual(sorted(matches.values_list("name", flat=True)), ["Beach Sandal", "Trail Runner"])
+        self.assertFalse(Product.objects.filter(search_filter("*")).exists())
+
+        admin_user = User.objects.create_superuser(username="admin", password="pw", email="a@example.com")
+        self.client.force_login(admin_user)
+        response = self.client.get("/admin/core/product/", {"q": "beach sand"})
+        self.assertEqual([p.name for p in response.context["cl"].result_list], ["Beach Sandal"])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(self.search("mountain"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trail.name = "Mountain Runner"
+            self.trail.save()
+        self.assertEqual(self.search("mountain"), ["Mountain Runner"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trail.delete()
+        self.assertEqual(self.search("mountain"), [])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get("/api/products/search/").status_code, 400)
+        self.assertEqual(self.search('"*'), [])
+
+
+class SearchIndexFlushTests(TransactionTestCase):
+    def test_flush_empties_the_index(self):
+        Product.objects.create(name="Trail Runner", price=120, category="men")
+        call_command("flush", interactive=False, verbosity=0)
+        self.assertEqual(Product.objects.count(), 0)
+        with connection.cursor() as cursor:
+            table = search.PG_TABLE if connection.vendor == "postgresql" else search.FTS_TABLE
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        # Ids restart after a flush: a new product must not match the old one's text.
+        Product.objects.create(name="Beach Sandal", price=40, category="women")
+        self.assertEqual(search.search_product_ids("trail"), [])
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_DERIVATIVES_ASYNC=False,
+            IMAGE_DERIVATIVE_WIDTHS=(320, 640), IMAGE_DERIVATIVE_FORMATS=("webp", "jpeg"),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload(self, name, size, mode="RGBA"):
+        buffer = BytesIO()
+        Image.new(mode, size, (200, 30, 30, 128) if mode == "RGBA" else (200, 30, 30)).save(buffer, format="PNG")
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_upload_generates_derivatives_after_commit(self):
+        name = self.upload("products/wide.png", (1200, 600))
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Wide", price=10, category="men", main_image=name)
+        with default_storage.open(derivative_name(name, 640, "webp")) as f:
+            self.assertEqual(Image.open(f).size, (640, 320))
+        with default_storage.open(derivative_name(name, 320, "jpeg")) as f:
+            self.assertEqual(Image.open(f).size, (320, 160))
+
+    def test_worker_threads_close_their_connection(self):
+        name = self.upload("products/wide.png", (1200, 600))
+        seen = {}
+
+        def on_generated(name, widths):
+            seen["widths"] = widths
+            seen["connected"] = Product.objects.exists() is not None and connection.connection is not None
+
+        def worker():
+            images._generate_in_worker(name, on_generated)
+            seen["closed"] = connection.connection is None
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        self.assertEqual(seen, {"widths": [320, 640], "connected": True, "closed": True})
+
+    def test_never_upscales(self):
+        name = self.upload("banners/narrow.png", (200, 100), mode="RGB")
+        generate_derivatives(name)
+        with default_storage.open(derivative_name(name, 640, "jpeg")) as f:
+            self.assertEqual(Image.open(f).size, (200, 100))
+        self.assertEqual(generate_derivatives(name), [])
+
+    def test_serializers_expose_srcset(self):
+        wide, side = self.upload("products/wide.png", (1200, 600)), self.upload("products/side.png", (800, 800))
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Wide", price=10, category="men", main_image=wide)
+            ProductImage.objects.create(product=product, image=side)
+        listing = self.client.get("/api/products/").data["results"][0]
+        self.assertEqual(listing["main_image_srcset"]["webp"],
+                         "http://testserver/media/products/wide__w320.webp 320w, "
+                         "http://testserver/media/products/wide__w640.webp 640w")
+        detail = self.client.get(f"/api/products/{product.pk}/").data
+        self.assertIn("side__w640.jpg 640w", detail["images"][0]["srcset"]["jpeg"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Banner.objects.create(image=self.upload("banners/b.png", (400, 100)))
+        # The 640 derivative of a 400px original is 400px wide: it is left out.
+        self.assertEqual(self.client.get("/api/banners/").data[0]["srcset"]["jpeg"],
+                         "http://testserver/media/banners/b__w320.jpg 320w")
+
+    def test_no_srcset_without_derivatives(self):
+        with self.settings(IMAGE_DERIVATIVES_ENABLED=False), self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name="Wide", price=10, category="men",
+                                             main_image=self.upload("products/wide.png", (1200, 600)))
+        self.assertEqual(self.client.get("/api/products/").data["results"][0]["main_image_srcset"], {})
+
+        call_command("generate_image_derivatives", stdout=StringIO())
+        product.refresh_from_db()
+        self.assertEqual(product.main_image_widths, [320, 640])
+
+        # A new upload forgets the widths of the old image until its own derivatives exist.
+        with default_storage.open(product.main_image.name) as f:
+            product.main_image = ContentFile(f.read(), name="new.png")
+        with self.settings(IMAGE_DERIVATIVES_ENABLED=False):
+            product.save()
+        self.assertEqual(Product.objects.get(pk=product.pk).main_image_widths, [])
+
+
+class FastSerializerTests(TestCase):
+    """core.fast_serializers must render exactly what the DRF serializers render."""
+
+    def setUp(self):
+        products = make_catalog(3)
+        products[0].main_image = "products/main shoe #1.png"
+        products[0].save()
+        products[2].main_image = "products/../main.png"
+        products[2].save()
+        products[1].colors.clear()
+        Product.objects.filter(pk=products[0].pk).update(main_image_widths=[320, 640])
+        Product.objects.create(name="Bare", price=Decimal("5.50"), category="kids")
+        Banner.objects.create(image="banners/a.png", link="https://example.com/sale", image_widths=[320])
+        Banner.objects.create(image="banners/b.png")
+        TrendingItem.objects.create(name="Hot", sub_name="Runner", price=Decimal("12.30"), image="trending/h.png",
+                                    image_widths=[320, 640, 1024])
+        TrendingItem.objects.create(name="Hotter", price=1, image="trending/i.png")
+
+    def assertSameJSON(self, fast, reference):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(fast), renderer.render(reference))
+
+    def requests(self):
+        request = Request(RequestFactory().get("/api/products/", secure=True, HTTP_HOST="shop.example.com"))
+        return (request, None)
+
+    def test_product_list(self):
+        products = Product.objects.for_list().order_by("-created_at")
+        rows = Product.objects.order_by("-created_at").values(*PRODUCT_LIST_FIELDS)
+        for request in self.requests():
+            with self.subTest(request=request):
+                self.assertSameJSON(
+                    serialize_product_list(rows, request),
+                    ProductListSerializer(products, many=True, context={"request": request}).data,
+                )
+
+    def test_banners_and_trending(self):
+        for request in self.requests():
+            with self.subTest(request=request):
+                context = {"request": request}
+                self.assertSameJSON(
+                    serialize_banners(Banner.objects.values(*BANNER_FIELDS), request),
+                    BannerSerializer(Banner.objects.all(), many=True, context=context).data,
+                )
+                self.assertSameJSON(
+                    serialize_trending(TrendingItem.objects.values(*TRENDING_FIELDS), request),
+                    TrendingItemSerializer(TrendingItem.objects.all(), many=True, context=context).data,
+                )
+
+    def test_endpoints_use_the_fast_path(self):
+        cache.clear()
+        client = APIClient()
+        with mock.patch("core.serializers.ProductListSerializer.to_representation") as drf:
+            self.assertEqual(len(client.get("/api/products/").json()["results"]), 4)
+            self.assertEqual(len(client.get("/api/banners/").json()), 2)
+            self.assertEqual(len(client.get("/api/trending/").json()), 2)
+        drf.assert_not_called()
+
+
+# --- Rendering ---
+class FastJSONRendererTests(TestCase):
+    def test_matches_drf_renderer(self):
+        from datetime import date, datetime, time, timezone as dt_timezone
+        from uuid import UUID
+        from zoneinfo import ZoneInfo
+
+        from django.utils.translation import gettext_lazy
+
+        data = {
+            "price": Decimal("12.30"),
+            "created_at": [
+                datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+                datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=ZoneInfo("Asia/Kolkata")),
+                datetime(2024, 1, 2, 3, 4, 5),
+                date(2024, 1, 2), time(3, 4, 5),
+            ],
+            "uuid": UUID(int=1), "lazy": gettext_lazy("Hello"), 7: "int key",
+            "text": "héllo \u2028 \u2029 \"quoted\"", "tuple": (1, 2.5, None, True), "big": 2 ** 70,
+            "delta": timedelta(seconds=5),
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_indent_falls_back_to_drf(self):
+        data = {"a": [1, 2]}
+        self.assertEqual(FastJSONRenderer().render(data, "application/json; indent=2"),
+                         JSONRenderer().render(data, "application/json; indent=2"))
+
+    def test_stream_json_array(self):
+        chunks = list(stream_json_array(range(100), lambda n: {"n": n}, buffer_size=64))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json.loads(b"".join(chunks)), [{"n": n} for n in range(100)])
+        self.assertEqual(b"".join(stream_json_array([], str)), b"[]")
+
+    def test_admin_order_export(self):
+        user = User.objects.create_user(username="shopper", password="pw")
+        for n in range(3):
+            order = Order.objects.create(user=user, total_price=Decimal("100.50"), shipping_address={"city": "Kochi"})
+            OrderItem.objects.create(order=order, product_id=n, product_name="Shoe", unit_price=Decimal("50.25"),
+                                     quantity=2)
+        admin_user = User.objects.create_superuser(username="admin", password="pw", email="a@example.com")
+        self.client.force_login(admin_user)
+
+        with override_settings(ORDER_EXPORT_CHUNK_SIZE=2), self.assertNumQueries(5):
+            # session + user, one cursor over the orders, items per chunk of two orders
+            response = self.client.get("/admin/core/order/export.json")
+            body = b"".join(response.streaming_content)
+        self.assertEqual(response["Content-Type"], "application/json")
+        orders = json.loads(body)
+        self.assertEqual([order["order_number"] for order in orders],
+                         list(Order.objects.order_by("pk").values_list("order_number", flat=True)))
+        self.assertEqual(orders[0]["total_price"], "100.50")
+        self.assertEqual(orders[0]["shipping_address"], {"city": "Kochi"})
+        self.assertEqual(orders[0]["items"][0]["unit_price"], "50.25")
+
+        self.client.force_login(user)
+        self.assertEqual(self.client.get("/admin/core/order/export.json").status_code, 302)
+
+
+# --- Cart ---
+class CartDetailTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper@example.com", password="pw")
+        self.cart = Cart.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, count):
+        for i, product in enumerate(make_catalog(count)):
+            CartItem.objects.create(
+                cart=self.cart, product=product, quantity=i + 1,
+                size=product.sizes.first(), color=product.colors.first(),
+            )
+
+    def assertCartQueries(self, item_count):
+        self.fill_cart(item_count)
+        # cart with total + items + product sizes + product colors
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/cart/")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_count_is_flat(self):
+        self.assertCartQueries(1)
+
+    def test_query_count_is_flat_for_large_cart(self):
+        self.assertCartQueries(20)
+
+    def test_totals_computed_in_database(self):
+        response = self.assertCartQueries(3)
+        # prices 100, 101, 102 with quantities 1, 2, 3
+        self.assertEqual(response.data["total_price"], Decimal("608.00"))
+        self.assertEqual([item["line_total"] for item in response.data["items"]],
+                         [Decimal("100.00"), Decimal("202.00"), Decimal("306.00")])
+
+    def test_conditional_get(self):
+        self.fill_cart(3)
+        etag = self.client.get("/api/cart/")["ETag"]
+        # only the cart row is read before answering 304
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/cart/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_cart_write_changes_etag(self):
+        self.fill_cart(1)
+        etag = self.client.get("/api/cart/")["ETag"]
+        item = CartItem.objects.get()
+        self.client.post(f"/api/cart/update/{item.pk}/", {"quantity": 9}, format="json")
+        response = self.client.get("/api/cart/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["items"][0]["quantity"], 9)
+
+    def test_empty_cart_total(self):
+        response = self.client.get("/api/cart/")
+        self.assertEqual(response.data["total_price"], Decimal("0"))
+        self.assertEqual(response.data["items"], [])
+
+
+class CartCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="badge@example.com", password="pw")
+        self.cart = Cart.objects.create(user=self.user)
+        self.product = make_catalog(1)[0]
+        self.size = self.product.sizes.first()
+        self.color = self.product.colors.first()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_count_is_one_query_then_cached(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, size=self.size, color=self.color, quantity=3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/cart/count/").data["count"], 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/cart/count/").data["count"], 3)
+
+    def test_empty_cart_count(self):
+        self.assertEqual(self.client.get("/api/cart/count/").data["count"], 0)
+
+    def test_count_computed_before_a_write_is_not_served(self):
+        key = cart_count_cache_key(self.user.pk)  # a miss starts...
+        CartItem.objects.create(cart=self.cart, product=self.product, size=self.size, color=self.color, quantity=3)
+        cart_changed(self.user.pk)  # ...a write lands...
+        cache.set(key, 0)  # ...and the miss stores the old total
+        self.assertEqual(self.client.get("/api/cart/count/").data["count"], 3)
+
+    def test_writes_invalidate_count(self):
+        self.assertEqual(self.client.get("/api/cart/count/").data["count"], 0)
+        response = self.client.post("/api/cart/add/", {
+            "product_id": self.product.pk, "size_id": self.size.pk, "color_id": self.color.pk, "quantity": 2,
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/api/cart/count/").data["count"], 2)
+
+        item_id = response.data["id"]
+        self.client.post(f"/api/cart/update/{item_id}/", {"quantity": 5}, format="json")
+        self.assertEqual(self.client.get("/api/cart/count/").data["count"], 5)
+
+        self.client.delete(f"/api/cart/remove/{item_id}/")
+        self.assertEqual(self.client.get("/api/cart/count/").data["count"], 0)
+
+
+class CartAddItemTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="adder@example.com", password="pw")
+        self.product = make_catalog(1)[0]
+        self.size = self.product.sizes.first()
+        self.color = self.product.colors.first()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, **overrides):
+        payload = {"product_id": self.product.pk, "size_id": self.size.pk, "color_id": self.color.pk, "quantity": 1}
+        payload.update(overrides)
+        return self.client.post("/api/cart/add/", payload, format="json")
+
+    def test_repeated_adds_increment(self):
+        self.add(quantity=2)
+        response = self.add(quantity=3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["quantity"], 5)
+        self.assertEqual(CartItem.objects.count(), 1)
+
+    def test_rejects_size_not_offered(self):
+        other_size = Size.objects.create(value="XXL")
+        response = self.add(size_id=other_size.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_unknown_product(self):
+        self.assertEqual(self.add(product_id=999999).status_code, 404)
+
+    def test_rejects_bad_quantity(self):
+        self.assertEqual(self.add(quantity=0).status_code, 400)
+        self.assertEqual(self.add(quantity="many").status_code, 400)
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="batch@example.com", password="pw")
+        self.cart = Cart.objects.create(user=self.user)
+        self.products = make_catalog(5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def variant(self, product):
+        return {"product_id": product.pk, "size_id": product.sizes.first().pk, "color_id": product.colors.first().pk}
+
+    def batch(self, operations):
+        return self.client.post("/api/cart/batch/", {"operations": operations}, format="json")
+
+    def test_bulk_add_returns_final_cart(self):
+        operations = [{"op": "add", "quantity": 2, **self.variant(p)} for p in self.products]
+        operations.append({"op": "add", "quantity": 1, **self.variant(self.products[0])})
+        response = self.batch(operations)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["items"]), 5)
+        self.assertEqual(CartItem.objects.get(product=self.products[0]).quantity, 3)
+        self.assertEqual(self.client.get("/api/cart/count/").data["count"], 11)
+
+    def test_update_and_remove(self):
+        keep = CartItem.objects.create(cart=self.cart, quantity=1, **self.variant(self.products[0]))
+        drop = CartItem.objects.create(cart=self.cart, product=self.products[1], size=self.products[1].sizes.first(),
+                                       color=self.products[1].colors.first(), quantity=1)
+        large = self.products[0].sizes.get(value="L")
+        response = self.batch([
+            {"op": "update", "item_id": keep.pk, "quantity": 4, "size_id": large.pk},
+            {"op": "remove", "item_id": drop.pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        keep.refresh_from_db()
+        self.assertEqual((keep.quantity, keep.size_id), (4, large.pk))
+        self.assertFalse(CartItem.objects.filter(pk=drop.pk).exists())
+
+    def test_update_onto_existing_variant_merges(self):
+        product = self.products[0]
+        small, large = product.sizes.get(value="S"), product.sizes.get(value="L")
+        color = product.colors.first()
+        first = CartItem.objects.create(cart=self.cart, product=product, size=small, color=color, quantity=1)
+        second = CartItem.objects.create(cart=self.cart, product=product, size=large, color=color, quantity=2)
+        response = self.batch([{"op": "update", "item_id": first.pk, "size_id": large.pk}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(CartItem.objects.values_list("pk", "quantity")), [(second.pk, 3)])
+
+    def test_line_can_move_onto_a_variant_another_line_leaves(self):
+        product = self.products[0]
+        small, large = product.sizes.get(value="S"), product.sizes.get(value="L")
+        red, blue = product.colors.get(name="Red"), product.colors.get(name="Blue")
+        b = CartItem.objects.create(cart=self.cart, product=product, size=large, color=red, quantity=2)
+        a = CartItem.objects.create(cart=self.cart, product=product, size=small, color=red, quantity=1)
+        response = self.batch([
+            {"op": "update", "item_id": a.pk, "color_id": blue.pk},
+            {"op": "update", "item_id": b.pk, "size_id": small.pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(CartItem.objects.values_list("pk", "size_id", "color_id", "quantity")),
+            [(b.pk, small.pk, red.pk, 2), (a.pk, small.pk, blue.pk, 1)],
+        )
+
+    def test_invalid_operation_rolls_back_everything(self):
+        other_size = Size.objects.create(value="XXL")
+        response = self.batch([
+            {"op": "add", "quantity": 1, **self.variant(self.products[0])},
+            {"op": "add", "quantity": 1, **self.variant(self.products[1]), "size_id": other_size.pk},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_body_must_be_an_object(self):
+        response = self.client.post("/api/cart/batch/", [{"op": "remove", "item_id": 1}], format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_cannot_touch_other_users_items(self):
+        other = Cart.objects.create(user=User.objects.create_user(username="other@example.com", password="pw"))
+        item = CartItem.objects.create(cart=other, product=self.products[0], size=self.products[0].sizes.first(),
+                                       color=self.products[0].colors.first())
+        response = self.batch([{"op": "remove", "item_id": item.pk}])
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(CartItem.objects.filter(pk=item.pk).exists())
+
+    def test_query_count_is_flat(self):
+        operations = [{"op": "add", "quantity": 1, **self.variant(p)} for p in self.products]
+        # user cart + savepoint + items + variants + insert + release + cart touch + final cart (4)
+        with self.assertNumQueries(11):
+            self.batch(operations)
+
+
+# --- Orders ---
+class CheckoutTests(TestCase):
+    ADDRESS = {"name": "Test Shopper", "line1": "1 Main St", "city": "Chennai", "pincode": "600001"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="buyer@example.com", password="pw")
+        self.cart = Cart.objects.create(user=self.user)
+        self.products = make_catalog(6)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, count):
+        for product in self.products[:count]:
+            CartItem.objects.create(cart=self.cart, product=product, size=product.sizes.first(),
+                                    color=product.colors.first(), quantity=2)
+
+    def checkout(self, **payload):
+        return self.client.post("/api/checkout/", {"shipping_address": self.ADDRESS, **payload}, format="json")
+
+    def test_checkout_from_cart_reprices_and_clears_cart(self):
+        self.fill_cart(2)
+        response = self.checkout(total_price="1.00")
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data["id"])
+        # (100 + 101) * 2, the client-supplied total is ignored
+        self.assertEqual(order.total_price, Decimal("402.00"))
+        self.assertEqual(response.json()["total_price"], "402.00")
+        self.assertEqual(order.items.count(), 2)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_checkout_ignores_client_prices(self):
+        product = self.products[0]
+        response = self.checkout(items=[{
+            "product_id": product.pk, "size_id": product.sizes.first().pk, "color_id": product.colors.first().pk,
+            "quantity": 3, "unit_price": "0.01", "product_name": "Free shoe",
+        }])
+        self.assertEqual(response.status_code, 201)
+        item = OrderItem.objects.get()
+        self.assertEqual((item.product_name, item.unit_price, item.quantity), ("Shoe 0", Decimal("100.00"), 3))
+        self.assertEqual(item.order.total_price, Decimal("300.00"))
+
+    def test_empty_cart_is_rejected(self):
+        self.assertEqual(self.checkout().status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_unavailable_variant_is_rejected(self):
+        product = self.products[0]
+        other_size = Size.objects.create(value="XXL")
+        response = self.checkout(items=[{
+            "product_id": product.pk, "size_id": other_size.pk, "color_id": product.colors.first().pk, "quantity": 1,
+        }])
+        self.assertEqual(response.status_code, 400)
+
+    def assertCheckoutQueries(self, lines):
+        self.fill_cart(lines)
+        # savepoint + cart lines + stock reservation + order insert + items insert + cart delete + release
+        # + cart touch
+        with self.assertNumQueries(8):
+            self.assertEqual(self.checkout().status_code, 201)
+
+    def test_query_count_one_line(self):
+        self.assertCheckoutQueries(1)
+
+    def test_query_count_many_lines(self):
+        self.assertCheckoutQueries(6)
+
+
+class ProductVariantTests(TestCase):
+    ADDRESS = CheckoutTests.ADDRESS
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="stock@example.com", password="pw")
+        self.product = make_catalog(1, stock=5)[0]
+        self.size = self.product.sizes.first()
+        self.color = self.product.colors.first()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def variant(self, size=None, color=None):
+        return ProductVariant.objects.get(product=self.product, size=size or self.size, color=color or self.color)
+
+    def line(self, quantity, size=None, color=None):
+        return {"product_id": self.product.pk, "size_id": (size or self.size).pk,
+                "color_id": (color or self.color).pk, "quantity": quantity}
+
+    def checkout(self, *lines):
+        return self.client.post("/api/checkout/", {"shipping_address": self.ADDRESS, "items": list(lines)},
+                                format="json")
+
+    def test_variants_follow_colors_and_sizes(self):
+        self.assertEqual(self.product.variants.count(), 4)
+        green = Color.objects.create(name="Green", hex="#00ff00")
+        self.product.colors.add(green)
+        self.assertEqual(self.product.variants.count(), 6)
+        self.assertEqual(self.variant(color=green).stock, 0)
+        self.product.sizes.remove(self.size)
+        self.assertEqual(self.product.variants.count(), 3)
+        self.product.colors.clear()
+        self.assertFalse(self.product.variants.exists())
+
+    def test_product_added_in_the_admin_is_sold_once_stocked(self):
+        admin_user = User.objects.create_superuser(username="admin", email="admin@example.com", password="pw")
+        client = Client()
+        client.force_login(admin_user)
+
+        def management_forms(initial_variants):
+            return {
+                f"{prefix}-{field}": value for prefix, initial in (("images", 0), ("variants", initial_variants))
+                for field, value in (("TOTAL_FORMS", initial), ("INITIAL_FORMS", initial),
+                                     ("MIN_NUM_FORMS", 0), ("MAX_NUM_FORMS", 1000))
+            }
+
+        fields = {"name": "Admin shoe", "sub_name": "Runner", "price": "99.00", "description": "", "category": "men",
+                  "rating": "0", "colors": [self.color.pk], "sizes": [self.size.pk]}
+        response = client.post("/admin/core/product/add/", {**fields, **management_forms(0)})
+        self.assertEqual(response.status_code, 302)
+        product = Product.objects.get(name="Admin shoe")
+        variant = product.variants.get()
+        self.assertEqual(variant.stock, 0)
+        line = {"product_id": product.pk, "size_id": self.size.pk, "color_id": self.color.pk, "quantity": 1}
+        self.assertEqual(self.client.post("/api/cart/add/", line, format="json").status_code, 409)
+
+        # The real count is entered in the variant inline.
+        response = client.post(f"/admin/core/product/{product.pk}/change/", {
+            **fields, **management_forms(1),
+            "variants-0-id": variant.pk, "variants-0-product": product.pk, "variants-0-stock": 3,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(product.variants.get().stock, 3)
+        self.assertEqual(self.client.post("/api/cart/add/", line, format="json").status_code, 200)
+
+    def test_sync_creates_missing_and_deletes_stale(self):
+        ProductVariant.objects.filter(product=self.product).delete()
+        stale = Size.objects.create(value="XXL")
+        ProductVariant.objects.bulk_create([ProductVariant(product=self.product, size=stale, color=self.color)])
+        ProductVariant.objects.sync([self.product.pk], stock=7)
+        variants = self.product.variants.all()
+        self.assertEqual(len(variants), 4)
+        self.assertEqual({variant.stock for variant in variants}, {7})
+
+    def test_cart_add_checks_stock(self):
+        response = self.client.post("/api/cart/add/", self.line(6), format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["available"], 5)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.client.post("/api/cart/add/", self.line(5), format="json").status_code, 200)
+
+    def test_cart_add_checks_the_line_total(self):
+        ProductVariant.objects.filter(pk=self.variant().pk).update(stock=3)
+        self.assertEqual(self.client.post("/api/cart/add/", self.line(2), format="json").status_code, 200)
+        response = self.client.post("/api/cart/add/", self.line(2), format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["available"], 3)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_cart_add_rejects_missing_variant(self):
+        ProductVariant.objects.filter(pk=self.variant().pk).delete()
+        self.assertEqual(self.client.post("/api/cart/add/", self.line(1), format="json").status_code, 400)
+
+    def test_checkout_takes_stock(self):
+        response = self.checkout(self.line(2), self.line(1, size=self.product.sizes.last()))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.variant().stock, 3)
+        self.assertEqual(self.variant(size=self.product.sizes.last()).stock, 4)
+
+    def test_repeated_lines_are_added_up(self):
+        response = self.checkout(self.line(3), self.line(3))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["items"][0]["requested"], 6)
+        self.assertEqual(self.variant().stock, 5)
+
+    def test_short_line_rolls_back_the_whole_order(self):
+        other = self.product.sizes.last()
+        ProductVariant.objects.filter(pk=self.variant(size=other).pk).update(stock=1)
+        response = self.checkout(self.line(4), self.line(2, size=other))
+        self.assertEqual(response.status_code, 409)
+        # only the short line is reported, with the stock as it was before the attempt
+        self.assertEqual(response.data["items"], [{
+            "product_id": self.product.pk, "product_name": "Shoe 0", "size": other.value,
+            "color": self.color.name, "requested": 2, "available": 1,
+        }])
+        self.assertEqual(self.variant().stock, 5)
+        self.assertEqual(self.variant(size=other).stock, 1)
+        self.assertFalse(Order.objects.exists())
+
+    def test_last_unit_sells_once(self):
+        self.assertEqual(self.checkout(self.line(5)).status_code, 201)
+        self.assertEqual(self.checkout(self.line(1)).status_code, 409)
+        self.assertEqual(self.variant().stock, 0)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="history@example.com", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place_orders(self, count, status="Pending"):
+        for i in range(count):
+            order = Order.objects.create(user=self.user, total_price=100, shipping_address={"city": "Chennai"}, status=status)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=1, product_name="Shoe", unit_price=50, quantity=1),
+                OrderItem(order=order, product_id=2, product_name="Sock", unit_price=50, quantity=1),
+            ])
+
+    def test_query_count_is_flat(self):
+        self.place_orders(30)
+        # order page + items prefetch
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/orders/?page_size=25")
+        self.assertEqual(len(response.data["results"]), 25)
+        self.assertEqual(len(response.data["results"][0]["items"]), 2)
+        self.assertNotIn("shipping_address", response.data["results"][0])
+        with self.assertNumQueries(2):
+            response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_tracking_excludes_delivered(self):
+        self.place_orders(2)
+        self.place_orders(3, status="Delivered")
+        response = self.client.get("/api/track-orders/")
+        self.assertEqual([o["status"] for o in response.data["results"]], ["Pending", "Pending"])
+
+    def test_only_own_orders(self):
+        other = User.objects.create_user(username="someone@example.com", password="pw")
+        Order.objects.create(user=other, total_price=1, shipping_address={})
+        self.place_orders(1)
+        self.assertEqual(len(self.client.get("/api/orders/").data["results"]), 1)
+
+
+class OrderNumberTests(TestCase):
+    def test_snowflake_ids_are_unique_and_monotonic(self):
+        generator = SnowflakeGenerator(worker_id=7)
+        ids = [generator.next_id() for _ in range(20000)]
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_unique_across_threads(self):
+        generator = SnowflakeGenerator(worker_id=1)
+        results = []
+
+        def worker():
+            results.extend(generator.next_id() for _ in range(5000))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 20000)
+
+    def test_order_numbers_sort_by_creation(self):
+        numbers = [snowflake_order_number() for _ in range(1000)]
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual({len(n) for n in numbers}, {len("ORD-") + 13})
+
+    def test_processes_never_share_a_worker_id(self):
+        # pid & 1023 used to give pids 1000 and 2024 the same worker id; two generators
+        # sharing one produce the same ids within a millisecond.
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir)
+        claimed = []
+        with override_settings(ORDER_NUMBER_LOCK_DIR=lock_dir):
+            for pid in (1000, 2024):
+                with mock.patch("core.order_numbers.os.getpid", return_value=pid):
+                    claimed.append(claim_worker_id())
+        for worker_id in claimed:
+            self.addCleanup(release_worker_id, worker_id)
+        self.assertEqual(claimed, [1000, 1001])
+
+        generators = [SnowflakeGenerator(worker_id) for worker_id in claimed]
+        ids = [generator.next_id() for _ in range(1000) for generator in generators]
+        self.assertEqual(len(set(ids)), 2000)
+
+    def test_released_worker_id_is_claimed_again(self):
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir)
+        with override_settings(ORDER_NUMBER_LOCK_DIR=lock_dir, ORDER_NUMBER_WORKER_IDS=range(5, 6)):
+            worker_id = claim_worker_id()
+            with self.assertRaises(ImproperlyConfigured):
+                claim_worker_id()
+            release_worker_id(worker_id)
+            self.assertEqual(claim_worker_id(), 5)
+            release_worker_id(5)
+
+    def test_rejects_out_of_range_worker(self):
+        with self.assertRaises(ValueError):
+            SnowflakeGenerator(worker_id=1024)
+
+    @override_settings(ORDER_NUMBER_GENERATOR="core.order_numbers.random_order_number")
+    def test_generator_is_pluggable(self):
+        user = User.objects.create_user(username="plug@example.com", password="pw")
+        order = Order.objects.create(user=user, total_price=0, shipping_address={})
+        self.assertRegex(order.order_number, r"^ORD-[0-9A-F]{6}$")
+
+
+# --- ASGI entry point ---
+class ASGIApplicationTests(SimpleTestCase):
+    @override_settings(DEBUG=True)
+    def test_middleware_runs_without_adaptation(self):
+        # Django logs every sync middleware it has to wrap in a thread for async requests.
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+    def test_static_files_are_served_in_front_of_django(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with open(f"{static_root}/app.css", "w") as f:
+            f.write("body{}")
+        seen = []
+
+        async def django_application(scope, receive, send):
+            seen.append(scope["path"])
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def get(application, path):
+            messages = []
+
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": [],
+                     "http_version": "1.1", "scheme": "http", "server": ("testserver", 80)}
+            await application(scope, receive, send)
+            return messages[0]["status"], b"".join(m.get("body", b"") for m in messages[1:])
+
+        with override_settings(STATIC_ROOT=static_root, STATIC_URL="/static/", DEBUG=False):
+            application = StaticFilesASGI(django_application)
+        self.assertEqual(async_to_sync(get)(application, "/static/app.css"), (200, b"body{}"))
+        self.assertEqual(async_to_sync(get)(application, "/api/products/")[0], 404)
+        self.assertEqual(seen, ["/api/products/"])
+
+
+# --- Async views ---
+@override_settings(IMAGE_DERIVATIVES_ENABLED=False)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="async@example.com", password="pw")
+        self.products = make_catalog(5)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def assertSameBody(self, sync_url, async_url):
+        sync_response = self.client.get(sync_url)
+        async_response = self.client.get(async_url)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        # Pagination links point at the endpoint that served the page.
+        self.assertEqual(async_response.content.replace(b"/api/async/", b"/api/"), sync_response.content)
+        return async_response
+
+    def test_cart_matches_sync_view(self):
+        cart = Cart.objects.create(user=self.user)
+        for product in self.products[:3]:
+            CartItem.objects.create(cart=cart, product=product, size=product.sizes.first(),
+                                    color=product.colors.first(), quantity=2)
+        response = self.assertSameBody("/api/cart/", "/api/async/cart/")
+        self.assertEqual(response["ETag"], self.client.get("/api/cart/")["ETag"])
+        self.assertEqual(self.client.get("/api/async/cart/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/async/cart/count/").json(), {"count": 6})
+
+    def test_new_cart_matches_sync_view(self):
+        self.assertSameBody("/api/async/cart/", "/api/cart/")
+
+    def test_product_list_and_detail_match_sync_views(self):
+        response = self.assertSameBody("/api/products/?page_size=2&max_price=103",
+                                       "/api/async/products/?page_size=2&max_price=103")
+        self.assertEqual(len(response.json()["results"]), 2)
+        cursor = response.json()["next"].split("?", 1)[1]
+        self.assertSameBody(f"/api/products/?{cursor}", f"/api/async/products/?{cursor}")
+        self.assertSameBody(f"/api/products/{self.products[0].pk}/", f"/api/async/products/{self.products[0].pk}/")
+        self.assertSameBody("/api/products/999999/", "/api/async/products/999999/")
+        self.assertSameBody("/api/products/?min_price=abc", "/api/async/products/?min_price=abc")
+
+    def test_product_list_is_cached(self):
+        etag = self.client.get("/api/async/products/")["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/async/products/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get("/api/async/products/").status_code, 200)
+
+    def test_orders_match_sync_view(self):
+        for _ in range(3):
+            order = Order.objects.create(user=self.user, total_price=100, shipping_address={})
+            OrderItem.objects.create(order=order, product_id=1, product_name="Shoe", unit_price=100, quantity=1)
+        response = self.assertSameBody("/api/orders/?page_size=2", "/api/async/orders/?page_size=2")
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_requires_token(self):
+        self.client.credentials()
+        for url in ("/api/async/cart/", "/api/async/cart/count/", "/api/async/orders/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.json(), self.client.get(url.replace("async/", "")).json())
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        self.assertEqual(self.client.get("/api/async/cart/").status_code, 401)
+
+
+# --- Request metrics ---
+@override_settings(IMAGE_DERIVATIVES_ENABLED=False, METRICS_TOKEN="")
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        REGISTRY.reset()
+        self.user = User.objects.create_user(username="metrics@example.com", password="pw")
+        make_catalog(3)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    @override_settings(CATALOG_SNAPSHOT=False)
+    def test_records_queries_serializer_time_and_size(self):
+        response = self.client.get("/api/products/")
+        stats = REGISTRY.get("products-list", "GET")
+        self.assertEqual(stats.statuses, {200: 1})
+        # token user + products
+        self.assertEqual(stats.queries.sum, 2)
+        self.assertGreater(stats.db_seconds, 0)
+        self.assertGreater(stats.serializer_seconds, 0)
+        self.assertEqual(stats.response_bytes, len(response.content))
+
+        # a cache hit only looks up the token user
+        self.client.get("/api/products/")
+        self.assertEqual(stats.queries.counts[1], 1)
+        self.assertEqual(stats.latency.count, 2)
+
+    def test_counts_async_view_queries(self):
+        self.client.get("/api/async/cart/count/")
+        self.assertEqual(REGISTRY.get("async-cart-count", "GET").queries.sum, 1)
+
+    def test_prometheus_text(self):
+        self.client.get("/api/cart/")
+        self.client.get("/api/nothing-here/")
+        body = self.client.get("/metrics/").content.decode()
+        self.assertIn('http_requests_total{view="cart-detail",method="GET",status="200"} 1', body)
+        self.assertIn('http_requests_total{view="unresolved",method="GET",status="404"} 1', body)
+        self.assertIn('db_queries_per_request_bucket{view="cart-detail",method="GET",le="+Inf"} 1', body)
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn('serializer_duration_seconds_total{view="cart-detail",method="GET"}', body)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_metrics_token(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get("/metrics/").status_code, 401)
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+
+    @override_settings(PERF_QUERY_BUDGET=10, PERF_QUERY_BUDGETS={"cart-detail": 2})
+    def test_query_budget_warning(self):
+        with self.assertLogs("core.metrics", "WARNING") as logs:
+            self.client.get("/api/cart/")
+        self.assertIn("cart-detail", logs.output[0])
+        self.assertEqual(REGISTRY.get("cart-detail", "GET").budget_exceeded, 1)
+        with self.assertNoLogs("core.metrics", "WARNING"):
+            self.client.get("/api/products/")
+
+
+# --- Benchmark fixtures ---
+@override_settings(IMAGE_DERIVATIVES_ENABLED=False)
+class PerfBenchmarkTests(TestCase):
+    @override_settings(CATALOG_SNAPSHOT=True)
+    def test_seed_and_bench(self):
+        call_command("seed_perf", products=30, users=6, order_items=100, batch_size=10, stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(ProductImage.objects.count(), 90)
+        self.assertEqual(Cart.objects.count(), 6)
+        self.assertEqual(OrderItem.objects.count(), 100)
+        self.assertEqual(Order.objects.values("order_number").distinct().count(), Order.objects.count())
+
+        out = StringIO()
+        call_command("bench_api", iterations=3, stdout=out)
+        report = json.loads(out.getvalue())
+        # the first request builds the catalog snapshot, the others need no queries
+        self.assertEqual(report["endpoints"]["products-list"]["queries"]["min"], 0)
+        self.assertEqual(report["endpoints"]["products-detail"]["queries"]["max"], 0)
+        self.assertEqual(report["endpoints"]["checkout"]["statuses"], {"201": 3})
+        self.assertEqual(report["endpoints"]["cart-add"]["statuses"], {"200": 3})
+        # the benchmark's writes are rolled back
+        self.assertEqual(OrderItem.objects.count(), 100)
+
+        out = StringIO()
+        call_command("bench_serializers", items=30, repeat=2, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["products"]["items"], 30)
+        self.assertGreater(report["products"]["drf_us_per_item"], 0)
+
+        out = StringIO()
+        call_command("bench_flash_sale", stock=4, buyers=6, threads=1, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["statuses"], {"201": 4, "409": 2})
+        self.assertEqual((report["sold_units"], report["final_stock"], report["oversold_units"]), (4, 0, 0))
+        # the sale product and its orders are deleted again
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(OrderItem.objects.count(), 100)
+
+
+# --- Database routing ---
+class PrimaryReplicaRouterTests(TestCase):
+    router = PrimaryReplicaRouter()
+
+    def route(self, method, view):
+        seen = []
+        ReadYourWritesMiddleware(lambda request: seen.append(view()))(RequestFactory().generic(method, "/"))
+        return seen[0]
+
+    def test_catalog_reads_go_to_replica(self):
+        read = lambda: [self.router.db_for_read(model) for model in (Product, Product.sizes.through, Banner, Cart, Order)]
+        self.assertEqual(self.route("GET", read), ["replica", "replica", "replica", "default", "default"])
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        def view():
+            before = self.router.db_for_read(Product)
+            self.assertEqual(self.router.db_for_write(CartItem), "default")
+            return before, self.router.db_for_read(Product)
+        self.assertEqual(self.route("GET", view), ("replica", "default"))
+        # the pin ends with the request
+        self.assertEqual(self.route("GET", lambda: self.router.db_for_read(Product)), "replica")
+
+    def test_unsafe_methods_read_from_primary(self):
+        self.assertEqual(self.route("POST", lambda: self.router.db_for_read(Product)), "default")
+
+    def test_cache_and_snapshot_fills_follow_the_replica_lag(self):
+        # Right after a bump they read from the primary, which has the change; later from the replica.
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Product))
+            return Response({})
+
+        mixin = CachedCatalogMixin()
+        mixin.cache_group = "products"
+        snapshot = mock.patch("core.catalog._build_snapshot",
+                              side_effect=lambda version: seen.append(self.router.db_for_read(Product)))
+        with override_settings(DATABASE_REPLICA_MAX_LAG=5), snapshot:
+            for query in ("fresh", "settled"):
+                cache.clear()
+                if query == "settled":
+                    cache.set("catalog:version:products", time.time_ns() - 6_000_000_000)
+                request = Request(RequestFactory().get(f"/api/products/?{query}"))
+                self.route("GET", lambda: mixin.cached_response(view, request))
+                self.route("GET", lambda: catalog.build_snapshot(get_version("products")))
+        self.assertEqual(seen, ["default", "default", "replica", "replica"])
+        self.assertEqual(self.route("GET", lambda: self.router.db_for_read(Product)), "replica")
+
+    def test_only_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate("default", "core"))
+        self.assertFalse(self.router.allow_migrate("replica", "core"))
+
+
+# --- Contact / background jobs ---
+class ContactJobTests(TestCase):
+    PAYLOAD = {"name": "Asha Rao", "email": "asha@example.com", "phone": "9876543210",
+               "message": "Do you stock size 46?"}
+
+    def test_contact_submit_queues_mail(self):
+        response = self.client.post("/api/contact/", self.PAYLOAD, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.get().status, "queued")
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Asha Rao", mail.outbox[0].body)
+        self.assertEqual(Job.objects.get().status, "done")
+
+    def test_batch_shares_one_connection(self):
+        for _ in range(5):
+            self.client.post("/api/contact/", self.PAYLOAD, content_type="application/json")
+        with mock.patch("core.jobs.get_connection", wraps=mail.get_connection) as get_connection:
+            self.assertEqual(run_pending(), 5)
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        self.client.post("/api/contact/", self.PAYLOAD, content_type="application/json")
+        job = Job.objects.get()
+        job.max_attempts = 2
+        job.save()
+        with mock.patch("core.jobs.get_connection", side_effect=OSError("smtp down")):
+            run_pending()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ("queued", 1))
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=20))
+            self.assertEqual(run_pending(), 0)  # not due yet
+
+            Job.objects.update(run_after=timezone.now())
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("smtp down", job.last_error)
+
+    def test_unknown_kind_is_retried_not_lost(self):
+        job = enqueue("no-such-kind", {})
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "queued")
+        self.assertIn("No handler", job.last_error)
+
+    def test_stale_running_jobs_are_reclaimed(self):
+        job = enqueue("send_mail", {"subject": "s", "body": "b", "from_email": "a@example.com",
+                                    "recipient_list": ["b@example.com"]})
+        Job.objects.filter(pk=job.pk).update(status="running", locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(IMAGE_DERIVATIVES_ENABLED=False)
+class ConcurrentCartAddTests(TransactionTestCase):
+    THREADS = 8
+    ADDS_PER_THREAD = 10
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("shared-cache in-memory SQLite raises 'table is locked' instead of waiting")
+
+    def test_no_lost_increments(self):
+        user = User.objects.create_user(username="tabs@example.com", password="pw")
+        cart = Cart.objects.create(user=user)
+        product = make_catalog(1)[0]
+        size_id, color_id = product.sizes.first().pk, product.colors.first().pk
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.ADDS_PER_THREAD):
+                    add_to_cart(cart, product.pk, size_id, color_id, 1)
+            except Exception as exc:  # surfaced in the main thread below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, self.THREADS * self.ADDS_PER_THREAD)
+
+
+@override_settings(IMAGE_DERIVATIVES_ENABLED=False)
+class ConcurrentCheckoutTests(TransactionTestCase):
+    THREADS = 8
+    STOCK = 5
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("shared-cache in-memory SQLite raises 'table is locked' instead of waiting")
+
+    def test_no_overselling(self):
+        product = make_catalog(1, stock=self.STOCK)[0]
+        item = {"product_id": product.pk, "size_id": product.sizes.first().pk,
+                "color_id": product.colors.first().pk, "quantity": 1}
+        users = [User.objects.create_user(username=f"rush{i}@example.com", password="pw") for i in range(self.THREADS)]
+        barrier = threading.Barrier(self.THREADS)
+        statuses = []
+
+        def worker(user):
+            try:
+                client = APIClient()
+                client.force_authenticate(user)
+                barrier.wait()
+                response = client.post("/api/checkout/", {"shipping_address": CheckoutTests.ADDRESS, "items": [item]},
+                                       format="json")
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [201] * self.STOCK + [409] * (self.THREADS - self.STOCK))
+        self.assertEqual(ProductVariant.objects.get(product=product, size_id=item["size_id"],
+                                                    color_id=item["color_id"]).stock, 0)
+        self.assertEqual(Order.objects.count(), self.STOCK)
+
+
+class SQLiteWriteConcurrencyTests(SimpleTestCase):
+    """
+    Parallel read-then-write transactions against a file database opened with
+    the configured OPTIONS (WAL, busy_timeout, BEGIN IMMEDIATE).
+    """
+    WRITERS = 8
+    READERS = 4
+    TRANSACTIONS = 25
+
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.settings_dict = {**connection.settings_dict, "NAME": f"{self.directory}/concurrency.sqlite3"}
+        with closing(self.open_connection()) as db:
+            with db.cursor() as cursor:
+                cursor.execute("CREATE TABLE stock (id INTEGER PRIMARY KEY, sold INTEGER NOT NULL)")
+                cursor.execute("INSERT INTO stock VALUES (1, 0)")
+
+    def open_connection(self):
+        return SQLiteDatabaseWrapper(self.settings_dict, alias="sqlite-concurrency")
+
+    def test_pragmas_are_applied(self):
+        with closing(self.open_connection()) as db:
+            with db.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                self.assertEqual(cursor.fetchone()[0], "wal")
+                cursor.execute("PRAGMA synchronous")
+                self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_wal_opt_out(self):
+        options = database_config(f"sqlite:///{self.directory}/rollback.sqlite3", wal=False)["OPTIONS"]
+        self.settings_dict = {**self.settings_dict, "NAME": f"{self.directory}/rollback.sqlite3", "OPTIONS": options}
+        with closing(self.open_connection()) as db:
+            with db.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                self.assertEqual(cursor.fetchone()[0], "delete")
+                cursor.execute("PRAGMA synchronous")
+                self.assertEqual(cursor.fetchone()[0], 2)  # FULL
+
+    def test_parallel_writers_do_not_hit_lock_errors(self):
+        barrier = threading.Barrier(self.WRITERS + self.READERS)
+        errors = []
+
+        def writer():
+            db = self.open_connection()
+            connections["sqlite-concurrency"] = db
+            try:
+                barrier.wait()
+                for _ in range(self.TRANSACTIONS):
+                    # Read, then write in the same transaction, like a cart add or checkout.
+                    with transaction.atomic(using="sqlite-concurrency"), db.cursor() as cursor:
+                        cursor.execute("SELECT sold FROM stock WHERE id = 1")
+                        sold = cursor.fetchone()[0]
+                        cursor.execute("UPDATE stock SET sold = %s WHERE id = 1", [sold + 1])
+            except Exception as exc:  # surfaced in the main thread below
+                errors.append(exc)
+            finally:
+                db.close()
+
+        def reader():
+            db = self.open_connection()
+            try:
+                barrier.wait()
+                for _ in range(self.TRANSACTIONS * 4):
+                    with db.cursor() as cursor:
+                        cursor.execute("SELECT sold FROM stock WHERE id = 1")
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(self.WRITERS)]
+        threads += [threading.Thread(target=reader) for _ in range(self.READERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with closing(self.open_connection()) as db:
+            with db.cursor() as cursor:
+                cursor.execute("SELECT sold FROM stock WHERE id = 1")
+                self.assertEqual(cursor.fetchone()[0], self.WRITERS * self.TRANSACTIONS)
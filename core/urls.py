@@ -4,7 +4,7 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
-from . import views
+from . import async_views, views
 from .views import (
     BannerViewSet,
     TrendingItemViewSet,
@@ -15,6 +15,7 @@ from .views import (
     cart_add_item,
     cart_update_item,
     cart_remove_item,
+    cart_batch,
     contact_submit,
     CheckoutView, UserOrdersView, TrackOrdersView
 )
@@ -32,6 +33,7 @@ urlpatterns = [
     path("cart/add/", cart_add_item, name="cart-add"),
     path("cart/update/<int:item_id>/", cart_update_item, name="cart-update"),
     path("cart/remove/<int:item_id>/", cart_remove_item, name="cart-remove"),
+    path("cart/batch/", cart_batch, name="cart-batch"),
 
     # Contact
     path('contact/', contact_submit, name="contact"),
@@ -46,6 +48,13 @@ urlpatterns = [
     path("orders/", UserOrdersView.as_view(), name="user_orders"),
     path("track-orders/", TrackOrdersView.as_view(), name="track_orders"),
 
+    # Async (ASGI) variants of the hot read endpoints
+    path("async/cart/", async_views.cart_detail, name="async-cart-detail"),
+    path("async/cart/count/", async_views.cart_count, name="async-cart-count"),
+    path("async/products/", async_views.product_list, name="async-product-list"),
+    path("async/products/<int:pk>/", async_views.product_detail, name="async-product-detail"),
+    path("async/orders/", async_views.user_orders, name="async-user-orders"),
+
     # Router URLs
     path('', include(router.urls)),
 ]
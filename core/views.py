@@ -1,32 +1,71 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
 from rest_framework import status, viewsets, permissions, generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.db.models import F, OuterRef, Prefetch, Subquery, Sum, prefetch_related_objects
+from django.db.models.functions import Coalesce
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
 from django.views.decorators.csrf import csrf_exempt
 import re
+import time
 
-from .models import Banner, TrendingItem, Product, Color, Size, Cart, CartItem
+from .models import Banner, TrendingItem, Product, ProductVariant, Color, Size, Cart, CartItem
 from .serializers import (
     BannerSerializer, TrendingItemSerializer, 
     ProductListSerializer, ProductDetailSerializer,
     ColorSerializer, SizeSerializer,
     CartSerializer, CartItemSerializer
 )
+from .pagination import ProductCursorPagination
+from .cache import CachedCatalogMixin, get_version
+from .search import search_product_ids
+from .filters import ProductFilter
+from .jobs import enqueue_mail
+from .fast_serializers import (
+    BANNER_FIELDS, PRODUCT_LIST_FIELDS, TRENDING_FIELDS,
+    serialize_banners, serialize_product_list, serialize_product_record_detail,
+    serialize_product_records, serialize_trending,
+)
+from . import catalog
+from django_filters.rest_framework import DjangoFilterBackend
+from django_filters.utils import translate_validation
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
 
 # --- Banner ---
-class BannerViewSet(viewsets.ModelViewSet):
+class BannerViewSet(CachedCatalogMixin, viewsets.ModelViewSet):
+    cache_group = "banners"
     queryset = Banner.objects.all().order_by("-created_at")
     serializer_class = BannerSerializer
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self._fast_list, request)
+
+    def _fast_list(self, request):
+        rows = self.get_queryset().values(*BANNER_FIELDS)
+        return Response(serialize_banners(rows, request))
+
 # --- Trending Items ---
-class TrendingItemViewSet(viewsets.ModelViewSet):
+class TrendingItemViewSet(CachedCatalogMixin, viewsets.ModelViewSet):
+    cache_group = "trending"
     queryset = TrendingItem.objects.all()
     serializer_class = TrendingItemSerializer
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self._fast_list, request)
+
+    def _fast_list(self, request):
+        rows = self.get_queryset().values(*TRENDING_FIELDS)
+        return Response(serialize_trending(rows, request))
+
 # --- Contact Form ---
 EMAIL_REGEX = re.compile(r'^[^\s@]+@[^\s@]+\.[^\s@]+$')
 NAME_REGEX = re.compile(r'^[A-Za-z\s]{3,20}$')
@@ -53,12 +92,9 @@ def contact_submit(request):
     subject = f"Contact form: {name}"
     body = f"New contact form submission\n\nName: {name}\nEmail: {email}\nPhone: {phone}\n\nMessage:\n{message}\n"
 
-    try:
-        send_mail(subject, body, settings.EMAIL_HOST_USER, [settings.EMAIL_HOST_USER], fail_silently=False)
-    except Exception as exc:
-        return Response({'error': 'Failed to send email.', 'details': str(exc)}, status=500)
-
-    return Response({'success': 'Message sent'})
+    # Delivered by `manage.py run_jobs`, so SMTP latency or outages never block the request.
+    enqueue_mail(subject, body, settings.EMAIL_HOST_USER, [settings.EMAIL_HOST_USER])
+    return Response({'success': 'Message queued'}, status=status.HTTP_202_ACCEPTED)
 
 # --- User Registration ---
 from rest_framework.serializers import ModelSerializer
@@ -84,9 +120,13 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
 
 # --- Products ---
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(CachedCatalogMixin, viewsets.ReadOnlyModelViewSet):
+    cache_group = "products"
     queryset = Product.objects.all().order_by("-created_at")
     permission_classes = [permissions.AllowAny]
+    pagination_class = ProductCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProductFilter
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -95,29 +135,203 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         qs = super().get_queryset()
-        category = self.request.query_params.get("category")
-        if category:
-            qs = qs.filter(category=category)
+        if self.action == "retrieve":
+            qs = qs.for_detail()
+        else:
+            qs = qs.for_list()
         return qs
 
+    def list(self, request, *args, **kwargs):
+        # Same JSON as ProductListSerializer, from the in-process catalog snapshot or from
+        # .values() rows (see core.catalog and core.fast_serializers).
+        return self.cached_response(self._snapshot_list if catalog.enabled() else self._fast_list, request)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not catalog.enabled():
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(self._snapshot_detail, request, *args, **kwargs)
+
+    def _snapshot_list(self, request):
+        filterset = self.filterset_class(request.query_params, queryset=Product.objects.none(), request=request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        records = catalog.get_snapshot().filter(**filterset.form.cleaned_data)
+        page = self.paginator.paginate_list(records, request, self, to_python=parse_datetime)
+        return self.get_paginated_response(serialize_product_records(page, request))
+
+    def _snapshot_detail(self, request, pk):
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise Http404  # as DRF's get_object_or_404
+        record = catalog.get_snapshot().get(pk)
+        if record is None:
+            raise Http404("No Product matches the given query.")
+        return Response(serialize_product_record_detail(record, request))
+
+    def _fast_list(self, request):
+        queryset = self.filter_queryset(Product.objects.all()).values(*PRODUCT_LIST_FIELDS)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serialize_product_list(page, request))
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """
+        Product counts per category, color and size for the current filters,
+        e.g. /products/facets/?category=men&max_price=2000. Cached per filter
+        combination like the listing itself.
+        """
+        return self.cached_response(self._facets, request)
+
+    def _facets(self, request):
+        queryset = self.filter_queryset(Product.objects.all())
+        facets = {"categories": [], "colors": [], "sizes": []}
+        for row in queryset.facet_counts():
+            if row["facet"] == "category":
+                facets["categories"].append({"value": row["key"], "count": row["count"]})
+            elif row["facet"] == "color":
+                facets["colors"].append({"id": int(row["key"]), "name": row["label"], "hex": row["extra"], "count": row["count"]})
+            else:
+                facets["sizes"].append({"id": int(row["key"]), "value": row["label"], "count": row["count"]})
+        for values in facets.values():
+            values.sort(key=lambda facet: -facet["count"])
+        return Response(facets)
+
+    SEARCH_LIMIT = 24
+    SEARCH_MAX_LIMIT = 100
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Ranked full-text search over name, sub_name and description.
+        /products/search/?q=<terms>&limit=<n>
+        """
+        return self.cached_response(self._search, request)
+
+    def _search(self, request):
+        query = (request.query_params.get("q") or "").strip()
+        if not query:
+            return Response({"error": "q is required"}, status=400)
+        try:
+            limit = min(max(int(request.query_params.get("limit", self.SEARCH_LIMIT)), 1), self.SEARCH_MAX_LIMIT)
+        except ValueError:
+            limit = self.SEARCH_LIMIT
+        ids = search_product_ids(query, limit)
+        rows = {row["id"]: row for row in Product.objects.filter(pk__in=ids).values(*PRODUCT_LIST_FIELDS)}
+        rows = [rows[pk] for pk in ids if pk in rows]
+        return Response({"results": serialize_product_list(rows, request)})
+
 # --- Cart APIs ---
 def get_user_cart(user):
     cart, created = Cart.objects.get_or_create(user=user)
     return cart
 
+def get_user_cart_with_total(user):
+    cart, created = Cart.objects.with_total_price().get_or_create(user=user)
+    return cart
+
+def prefetch_cart_items(cart):
+    prefetch_related_objects([cart], Prefetch("items", queryset=CartItem.objects.for_display()))
+    return cart
+
+def get_user_cart_for_display(user):
+    """
+    Cart with ``total_price`` annotated and items prefetched for CartSerializer.
+    Costs 4 queries regardless of how many items are in the cart.
+    """
+    return prefetch_cart_items(get_user_cart_with_total(user))
+
+def cart_etag(cart, products_version=None):
+    # Cart.updated_at is bumped by every cart write (see cart_changed); the
+    # product version covers price and name changes of items in the cart.
+    if products_version is None:
+        products_version = get_version("products")
+    return 'W/"cart-%s-%s-%s"' % (cart.pk, int(cart.updated_at.timestamp() * 1_000_000), products_version)
+
+# Badge counter, cached per user under a per-user version that every cart write
+# below moves: a count computed before a write is stored under the old version
+# and never read, however the two interleave.
+CART_COUNT_VERSION_KEY = "cart:count-version:{user_id}"
+
+def cart_count_timeout():
+    return getattr(settings, "CART_COUNT_CACHE_TIMEOUT", 60 * 60)
+
+def cart_count_cache_key(user_id):
+    version_key = CART_COUNT_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(version_key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return f"cart:count:{user_id}:{version}"
+
+async def acart_count_cache_key(user_id):
+    version_key = CART_COUNT_VERSION_KEY.format(user_id=user_id)
+    version = await cache.aget(version_key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(version_key, version, None):
+            version = await cache.aget(version_key, version)
+    return f"cart:count:{user_id}:{version}"
+
+def invalidate_cart_count(user_id):
+    cache.set(CART_COUNT_VERSION_KEY.format(user_id=user_id), time.time_ns(), None)
+
+def cart_changed(user_id):
+    """Call after any write to a user's cart items."""
+    Cart.objects.filter(user_id=user_id).update(updated_at=timezone.now())
+    invalidate_cart_count(user_id)
+
 @api_view(['GET'])
+@authentication_classes([JWTStatelessUserAuthentication])
 @permission_classes([IsAuthenticated])
 def cart_count(request):
-    cart = get_user_cart(request.user)
-    total_qty = sum([item.quantity for item in cart.items.all()])
+    # Stateless JWT auth skips the user lookup, so a cache hit costs no queries.
+    key = cart_count_cache_key(request.user.pk)
+    total_qty = cache.get(key)
+    if total_qty is None:
+        total_qty = CartItem.objects.filter(cart__user_id=request.user.pk).aggregate(
+            total=Coalesce(Sum("quantity"), 0)
+        )["total"]
+        cache.set(key, total_qty, cart_count_timeout())
     return Response({'count': total_qty})
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def cart_detail(request):
-    cart = get_user_cart(request.user)
-    serializer = CartSerializer(cart, context={'request': request})
-    return Response(serializer.data)
+    cart = get_user_cart_with_total(request.user)
+    etag = cart_etag(cart)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        serializer = CartSerializer(prefetch_cart_items(cart), context={'request': request})
+        response = Response(serializer.data)
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def add_to_cart(cart, product_id, size_id, color_id, quantity):
+    """
+    Add ``quantity`` of a variant to ``cart`` without losing concurrent updates.
+
+    The increment happens in the database (``quantity = quantity + n``); if the
+    row does not exist yet it is inserted, and a concurrent insert that wins the
+    race on the unique (cart, product, size, color) constraint falls back to the
+    increment.
+    """
+    lookup = {"cart": cart, "product_id": product_id, "size_id": size_id, "color_id": color_id}
+    with transaction.atomic():
+        updated = CartItem.objects.filter(**lookup).update(quantity=F("quantity") + quantity)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(quantity=quantity, **lookup)
+            except IntegrityError:
+                CartItem.objects.filter(**lookup).update(quantity=F("quantity") + quantity)
+    return lookup
+
+def out_of_stock_response(stock):
+    return Response({"error": "Not enough stock for this size and color", "available": stock},
+                    status=status.HTTP_409_CONFLICT)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -132,28 +346,42 @@ def cart_add_item(request):
     }
     """
     user = request.user
-    cart = get_user_cart(user)
     data = request.data
-    product_id = data.get("product_id")
-    size_id = data.get("size_id")
-    color_id = data.get("color_id")
-    quantity = int(data.get("quantity", 1))
+    try:
+        product_id = int(data.get("product_id") or 0)
+        size_id = int(data.get("size_id") or 0)
+        color_id = int(data.get("color_id") or 0)
+        quantity = int(data.get("quantity", 1))
+    except (TypeError, ValueError):
+        return Response({"error": "Product, size, color and quantity must be integers"}, status=400)
 
     if not (product_id and size_id and color_id):
         return Response({"error": "Product, size, and color are required"}, status=400)
+    if quantity < 1:
+        return Response({"error": "Quantity must be at least 1"}, status=400)
 
-    product = get_object_or_404(Product, pk=product_id)
-    size = get_object_or_404(Size, pk=size_id)
-    color = get_object_or_404(Color, pk=color_id)
+    # Product existence, the variant's stock and what the cart already holds of it in a single
+    # query: the line's new total must fit in the stock, as for updates and batches.
+    offer = Product.objects.filter(pk=product_id).annotate(
+        stock=Subquery(ProductVariant.objects.filter(
+            product_id=OuterRef("pk"), size_id=size_id, color_id=color_id,
+        ).values("stock")[:1]),
+        in_cart=Subquery(CartItem.objects.filter(
+            cart__user_id=user.pk, product_id=OuterRef("pk"), size_id=size_id, color_id=color_id,
+        ).values("quantity")[:1]),
+    ).values("stock", "in_cart").first()
+    if offer is None:
+        return Response({"error": "Product not found"}, status=404)
+    if offer["stock"] is None:
+        return Response({"error": "Size or color is not available for this product"}, status=400)
+    if offer["stock"] < (offer["in_cart"] or 0) + quantity:
+        return out_of_stock_response(offer["stock"])
 
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart, product=product, size=size, color=color,
-        defaults={'quantity': quantity}
-    )
-    if not created:
-        cart_item.quantity += quantity
-        cart_item.save()
+    cart = get_user_cart(user)
+    lookup = add_to_cart(cart, product_id, size_id, color_id, quantity)
+    cart_changed(user.pk)
 
+    cart_item = CartItem.objects.for_display().get(**lookup)
     serializer = CartItemSerializer(cart_item, context={'request': request})
     return Response(serializer.data)
 
@@ -174,8 +402,16 @@ def cart_update_item(request, item_id):
 
     if quantity < 1:
         return Response({"error": "Quantity must be at least 1"}, status=400)
+    stock = ProductVariant.objects.filter(
+        product_id=cart_item.product_id, size_id=cart_item.size_id, color_id=cart_item.color_id,
+    ).values_list("stock", flat=True).first()
+    if stock is None:
+        return Response({"error": "Size or color is not available for this product"}, status=400)
+    if stock < quantity:
+        return out_of_stock_response(stock)
     cart_item.quantity = quantity
     cart_item.save()
+    cart_changed(request.user.pk)
     serializer = CartItemSerializer(cart_item, context={'request': request})
     return Response(serializer.data)
 
@@ -187,17 +423,175 @@ def cart_remove_item(request, item_id):
     """
     cart_item = get_object_or_404(CartItem, pk=item_id, cart__user=request.user)
     cart_item.delete()
+    cart_changed(request.user.pk)
     return Response({"success": True})
 
+CART_BATCH_MAX_OPERATIONS = 100
+
+def _batch_int(operation, index, field, default=None):
+    value = operation.get(field, default)
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        raise ValidationError({"operations": f"Operation {index}: {field} must be an integer"})
+
+class CartConflict(Exception):
+    """Another request added one of the batch's lines meanwhile."""
+
+
+def apply_cart_batch(cart, operations):
+    """
+    Apply a list of add/update/remove operations to ``cart`` in one transaction.
+
+    The cart's items and the variants (with stock) of every product involved
+    are loaded up front (2 queries); the operations are then applied in memory
+    and written back with one delete, one ``bulk_update`` and one ``bulk_create``.
+    A line may not ask for more than its variant's stock.
+
+    Lines that change variant are deleted and re-inserted with their id rather
+    than updated in place: row-by-row updates could briefly give two lines the
+    same variant (A leaving the variant B moves onto) and trip the unique
+    constraint.  Only a line inserted concurrently by another request can make
+    the final insert fail; that raises ``CartConflict``.
+    """
+    with transaction.atomic():
+        items = list(cart.items.select_for_update())
+        by_id = {item.pk: item for item in items}
+        by_key = {(item.product_id, item.size_id, item.color_id): item for item in items}
+
+        product_ids = set()
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict) or operation.get("op") not in ("add", "update", "remove"):
+                raise ValidationError({"operations": f"Operation {index}: op must be add, update or remove"})
+            if operation["op"] == "add":
+                product_ids.add(_batch_int(operation, index, "product_id"))
+        product_ids.update(item.product_id for item in items)
+        stock = {
+            (product_id, size_id, color_id): count for product_id, size_id, color_id, count in
+            ProductVariant.objects.filter(product_id__in=product_ids).values_list("product_id", "size_id", "color_id", "stock")
+        }
+
+        def check_offer(index, product_id, size_id, color_id):
+            if (product_id, size_id, color_id) not in stock:
+                raise ValidationError({"operations": f"Operation {index}: size or color is not available for this product"})
+
+        def check_quantity(index, quantity):
+            if quantity is None or quantity < 1:
+                raise ValidationError({"operations": f"Operation {index}: quantity must be at least 1"})
+
+        new_items, dirty, removed, moved = [], set(), set(), set()
+        for index, operation in enumerate(operations):
+            op = operation["op"]
+            if op == "add":
+                product_id = _batch_int(operation, index, "product_id")
+                size_id = _batch_int(operation, index, "size_id")
+                color_id = _batch_int(operation, index, "color_id")
+                quantity = _batch_int(operation, index, "quantity", 1)
+                check_offer(index, product_id, size_id, color_id)
+                check_quantity(index, quantity)
+                key = (product_id, size_id, color_id)
+                if key in by_key:
+                    by_key[key].quantity += quantity
+                    if by_key[key].pk:
+                        dirty.add(by_key[key])
+                else:
+                    item = CartItem(cart=cart, product_id=product_id, size_id=size_id, color_id=color_id, quantity=quantity)
+                    by_key[key] = item
+                    new_items.append(item)
+                continue
+
+            item = by_id.get(_batch_int(operation, index, "item_id"))
+            if item is None or item.pk in removed:
+                raise ValidationError({"operations": f"Operation {index}: cart item not found"})
+            old_key = (item.product_id, item.size_id, item.color_id)
+            if op == "remove":
+                removed.add(item.pk)
+                dirty.discard(item)
+                moved.discard(item)
+                del by_key[old_key]
+                continue
+
+            quantity = _batch_int(operation, index, "quantity", item.quantity)
+            size_id = _batch_int(operation, index, "size_id", item.size_id)
+            color_id = _batch_int(operation, index, "color_id", item.color_id)
+            check_quantity(index, quantity)
+            key = (item.product_id, size_id, color_id)
+            if key != old_key:
+                check_offer(index, item.product_id, size_id, color_id)
+                del by_key[old_key]
+                target = by_key.get(key)
+                if target is not None:
+                    # Moving onto a variant that is already in the cart merges the lines.
+                    target.quantity += quantity
+                    if target.pk:
+                        dirty.add(target)
+                    removed.add(item.pk)
+                    dirty.discard(item)
+                    moved.discard(item)
+                    continue
+                by_key[key] = item
+                moved.add(item)
+            item.size_id, item.color_id, item.quantity = size_id, color_id, quantity
+            dirty.add(item)
+
+        for key, item in by_key.items():
+            if item.quantity > stock.get(key, 0) and (item in dirty or not item.pk):
+                raise ValidationError({"operations": f"Not enough stock for product {key[0]} in this size and color"})
+
+        if removed or moved:
+            CartItem.objects.filter(pk__in=removed | {item.pk for item in moved}).delete()
+        if dirty - moved:
+            CartItem.objects.bulk_update(dirty - moved, ["quantity"])
+        if new_items or moved:
+            try:
+                CartItem.objects.bulk_create(list(moved) + new_items)
+            except IntegrityError:
+                raise CartConflict
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cart_batch(request):
+    """
+    Apply several cart changes at once and return the resulting cart.
+    Expects JSON:
+    {
+        "operations": [
+            {"op": "add", "product_id": int, "size_id": int, "color_id": int, "quantity": int},
+            {"op": "update", "item_id": int, "quantity": int, "size_id": int, "color_id": int},
+            {"op": "remove", "item_id": int}
+        ]
+    }
+    """
+    operations = request.data.get("operations") if isinstance(request.data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return Response({"error": "operations must be a non-empty list"}, status=400)
+    if len(operations) > CART_BATCH_MAX_OPERATIONS:
+        return Response({"error": f"At most {CART_BATCH_MAX_OPERATIONS} operations per batch"}, status=400)
+
+    cart = get_user_cart(request.user)
+    try:
+        apply_cart_batch(cart, operations)
+    except CartConflict:
+        return Response({"error": "Cart was modified concurrently, please retry"}, status=409)
+    cart_changed(request.user.pk)
+
+    cart = get_user_cart_for_display(request.user)
+    serializer = CartSerializer(cart, context={'request': request})
+    return Response(serializer.data)
+
 
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status, generics
-from .serializers import OrderSerializer
+from rest_framework import status, generics, serializers
+from .serializers import OrderListSerializer, CheckoutSerializer, OutOfStock
+from .pagination import OrderCursorPagination
 from .models import Order
 
+# Formats the total like the order serializers ("14997.00"), not as a JSON number.
+_order_total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
 class CheckoutView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -205,32 +599,44 @@ class CheckoutView(APIView):
         """
         Expected payload:
         {
-          "total_price": "2799.00",
           "shipping_address": { ... },
-          "items": [{ product_id, product_name, sub_name, main_image_url, unit_price, quantity, size, color }, ...]
+          "items": [{ product_id, size_id, color_id, quantity }, ...]   # optional, defaults to the cart
         }
+        Prices, names and the total are always computed on the server.
         """
-        data = request.data.copy()
-        data["user"] = request.user.id
-        serializer = OrderSerializer(data=data, context={"request": request})
+        serializer = CheckoutSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
-            order = serializer.save()
-            return Response({"order_number": order.order_number, "id": order.id}, status=status.HTTP_201_CREATED)
+            try:
+                order = serializer.save()
+            except OutOfStock as exc:
+                return Response({"error": "Not enough stock", "items": exc.items}, status=status.HTTP_409_CONFLICT)
+            cart_changed(request.user.pk)
+            return Response(
+                {"order_number": order.order_number, "id": order.id, "total_price": _order_total.to_representation(order.total_price)},
+                status=status.HTTP_201_CREATED,
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class UserOrdersView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = OrderSerializer
+    serializer_class = OrderListSerializer
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by("-created_at")
+        return Order.objects.filter(user=self.request.user).prefetch_related("items").order_by("-created_at")
 
 
 class TrackOrdersView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = OrderSerializer
+    serializer_class = OrderListSerializer
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
         # return orders not delivered (current tracking)
-        return Order.objects.filter(user=self.request.user).exclude(status="Delivered").order_by("-created_at")
+        return (
+            Order.objects.filter(user=self.request.user)
+            .exclude(status="Delivered")
+            .prefetch_related("items")
+            .order_by("-created_at")
+        )